@@ -12,26 +12,121 @@
 """
 # Time is needed for comparing the different bit sizes
 import time
+# sys and argparse are used to run without the prompts, reading messages from stdin or a file
+import sys
+import argparse
+# os is used to find the number of cores to use for worker processes
+import os
+# mmap is used to hash files a chunk at a time without reading them into memory
+import mmap
+# gcd is used to check the primes of multi-prime key pairs
+from math import gcd
 # RSA is used to generate the key pair
 from Cryptodome.PublicKey import RSA
-# sha512 is used to create a hash of the encoded sent data
-from hashlib import sha512
+# Used to generate the primes of multi-prime key pairs
+from Cryptodome.Math.Primality import generate_probable_prime
+from Cryptodome.Random import get_random_bytes
+# The digests are used to create a hash of the encoded sent data, sha256 also to fingerprint saved key pairs
+from hashlib import sha512, sha256, sha3_256, blake2b
 # threading is used to have multiple threads to get average time it takes to run for certain bit size
-from threading import Thread
-# Uses excel to provide some analysis of key pair bit size
-from xlwt import Workbook
+from threading import Thread, Lock
+# Worker processes are used to find average time on every core instead of threads sharing one
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+# A multiprocessing pool is used to search for p and q at the same time, it can be stopped once both are found
+from multiprocessing import Pool
+# statistics is used to find how precise the average of each bit size is while sweeping
+import statistics
+# csv is used to stream results of the multiple averages to a file as each bit size finishes
+import csv
+# json is used to store the settings a results file was made with next to it
+import json
+# Uses excel to provide some analysis of key pair bit size. Optional, results are always written to a csv file
+try:
+    from xlwt import Workbook
+except ImportError:
+    Workbook = None
+# gmpy2 is optional, when it is installed modular exponentiation is done with it instead of pow() since it is faster
+try:
+    import gmpy2
+
+    def powmod(base, exponent, modulus):
+        return int(gmpy2.powmod(base, exponent, modulus))
+
+    arithmetic_backend = 'gmpy2'
+except ImportError:
+    powmod = pow
+    arithmetic_backend = 'python'
 
 # Global bit_size for bit_size for easy change when needed
 global bit_size
 bit_size = 1024
-# Global average_time for average_time will be altered a lot by threads
-global average_time
-average_time = 0
+# Global crt for whether signing uses the Chinese Remainder Theorem
+global crt
+crt = True
+# Global processes for whether averages are found using worker processes instead of threads
+global processes
+processes = True
+# Global workers for the number of worker processes, None uses one for every core
+global workers
+workers = None
+# Global reuse_key for whether a saved key pair is reused instead of generating a new one
+global reuse_key
+reuse_key = False
+# Folder that key pairs are saved in, one folder per bit size
+keystore_directory = 'keystore'
+# Global primes for the number of primes in the modulus. 3 are only used for bit sizes of 4096 and up, 4 for 8192 and
+# up, so every prime stays at least 1365 bits
+global primes
+primes = 2
+# Smallest bit size that uses each number of primes above two
+multi_prime_min_bit_sizes = {3: 4096, 4: 8192}
+# Digests that the data can be hashed with, by the name that is stored with a signature
+digests = {'sha256': sha256, 'sha512': sha512, 'sha3_256': sha3_256, 'blake2b': blake2b}
+# Global digest for the name of the digest that data is hashed with before signing
+global digest
+digest = 'sha512'
+# Global parallel_keygen for whether p and q are searched for at the same time on worker processes
+global parallel_keygen
+parallel_keygen = False
+# CRT parameters (dp, dq, qinv) of the key pairs that signed most recently, by (n, d), so a key pair that signs
+# many times only works them out once
+crt_cache = {}
+crt_cache_size = 64
+crt_cache_lock = Lock()
+
+
+class MultiPrimeKey:
+    """
+        RSA key pair whose modulus is the product of more than two primes.
+            - Has 'n', 'e' and 'd' like a key pair from RSA.generate
+            - exponents are d mod (p - 1) and coefficients the inverse of the product of the primes before, per prime
+
+        @param:
+            key_primes : the distinct primes
+            e : the public exponent
+    """
+
+    def __init__(self, key_primes, e=65537):
+        self.primes = tuple(key_primes)
+        self.e = e
+        self.n = 1
+        lambda_n = 1
+        for prime in self.primes:
+            self.n *= prime
+            lambda_n = lambda_n * (prime - 1) // gcd(lambda_n, prime - 1)
+        self.d = pow(e, -1, lambda_n)
+        self.exponents = tuple(self.d % (prime - 1) for prime in self.primes)
+        self.coefficients = [1]
+        product = self.primes[0]
+        for prime in self.primes[1:]:
+            self.coefficients.append(pow(product, -1, prime))
+            product *= prime
 
 
 def generate(comparing):
     """
         Method generates a RSA key pair with a size of some number of bits
+            - If the global reuse_key is True, a saved key pair of the bit size is loaded instead, saving one if needed
 
         @param:
             comparing : This is conditional on whether it was desired to print out key pairs
@@ -39,19 +134,249 @@ def generate(comparing):
         @return:
             key_pair: this contains a public and private key
     """
-    if not comparing:
-        print("\nGenerating a key_pair of size: \n", bit_size)
-    key_pair = RSA.generate(bits=bit_size)
+    key_pair = None
+    if reuse_key:
+        key_pair = load_key(bit_size)
+    if key_pair is None:
+        if not comparing:
+            print("\nGenerating a key_pair of size: \n", bit_size)
+        prime_count = usable_primes(bit_size, primes)
+        if prime_count > 2:
+            key_pair = generate_multi_prime(bit_size, prime_count)
+        elif parallel_keygen:
+            key_pair = generate_parallel(bit_size)
+        else:
+            key_pair = RSA.generate(bits=bit_size)
+        if reuse_key and not isinstance(key_pair, MultiPrimeKey):
+            save_key(key_pair)
     if not comparing:
         print("\n[Public key]: \n", "(", hex(key_pair.n), ",", hex(key_pair.e), ")")
         print("\n[Private key]: \n", "(", hex(key_pair.n), ",", hex(key_pair.d), ")")
     return key_pair
 
 
+def usable_primes(current_bit_size, prime_count):
+    """
+        Method finds the number of primes to use for a bit size, the most up to prime_count that is allowed for it
+
+        @param:
+            current_bit_size : the bit size of the key pair
+            prime_count : the number of primes that was asked for
+
+        @return:
+            prime_count : 2, 3 or 4
+    """
+    allowed = [count for count, min_bit_size in multi_prime_min_bit_sizes.items()
+               if count <= prime_count and current_bit_size >= min_bit_size]
+    return max(allowed, default=2)
+
+
+def generate_multi_prime(current_bit_size, prime_count):
+    """
+        Method generates a RSA key pair whose modulus is the product of 3 or 4 primes
+            - Every prime is large enough that the product always has exactly current_bit_size bits
+
+        @param:
+            current_bit_size : the size of the modulus in bits
+            prime_count : the number of primes
+
+        @return:
+            key_pair : a MultiPrimeKey
+    """
+    key_primes = []
+    for index in range(prime_count):
+        size = current_bit_size // prime_count + (1 if index < current_bit_size % prime_count else 0)
+        # Smallest prime so that the product is at least 2^(current_bit_size - 1): the k-th root of 2^(size*k - 1)
+        min_prime = 1 << (size - 1)
+        high = 1 << size
+        while min_prime < high:
+            middle = (min_prime + high) // 2
+            if middle ** prime_count < 1 << (size * prime_count - 1):
+                min_prime = middle + 1
+            else:
+                high = middle
+
+        def prime_filter(candidate, min_prime=min_prime):
+            candidate = int(candidate)
+            return candidate >= min_prime and gcd(candidate - 1, 65537) == 1 and candidate not in key_primes
+
+        key_primes.append(int(generate_probable_prime(exact_bits=size, randfunc=get_random_bytes,
+                                                      prime_filter=prime_filter)))
+    return MultiPrimeKey(key_primes)
+
+
+def search_prime(size):
+    """
+        Helper method: generate_parallel(current_bit_size)
+            - runs in a worker process and finds one prime whose top two bits are set
+
+        @param:
+            size : the size of the prime in bits
+
+        @return:
+            prime : the prime
+    """
+    def prime_filter(candidate):
+        candidate = int(candidate)
+        return candidate >> (size - 2) == 3 and gcd(candidate - 1, 65537) == 1
+
+    return int(generate_probable_prime(exact_bits=size, randfunc=get_random_bytes, prime_filter=prime_filter))
+
+
+def generate_parallel(current_bit_size):
+    """
+        Method generates a RSA key pair by searching for p and q at the same time on worker processes
+            - With more workers than two, the extra searches are speculative and the first two primes found are used
+            - The pool is stopped as soon as a pair is found, which cancels the searches that are still running
+
+        @param:
+            current_bit_size : the size of the modulus in bits
+
+        @return:
+            key_pair : a RSA key pair, the same as from RSA.generate
+    """
+    num_workers = max(2, workers or os.cpu_count() or 1)
+    sizes = [(current_bit_size + 1) // 2, current_bit_size // 2] * num_workers
+    found = []
+    with Pool(processes=num_workers) as pool:
+        while True:
+            for prime in pool.imap_unordered(search_prime, sizes):
+                for other in found:
+                    p, q = max(prime, other), min(prime, other)
+                    # p and q must not be too close, or n can be factored by starting at its square root
+                    if (p * q).bit_length() == current_bit_size and \
+                            (p - q).bit_length() > current_bit_size // 2 - 100:
+                        d = pow(65537, -1, (p - 1) * (q - 1) // gcd(p - 1, q - 1))
+                        return RSA.construct((p * q, 65537, d, p, q))
+                found.append(prime)
+
+
+def crt_signing(hashed, key_pair):
+    """
+        Method raises the hash to the power 'd' modulo 'n' using the Chinese Remainder Theorem:
+            - dp = d mod (p - 1), dq = d mod (q - 1) and qinv = q^-1 mod p are used to do two half sized
+              exponentiations modulo 'p' and 'q' instead of one modulo 'n'
+            - the result is checked against the public exponent so a faulty signature is never returned
+
+        @param:
+            hashed : the hash value of the message digest
+            key_pair : the key pair that was generated earlier
+
+        @return:
+            signature : the generated signature
+    """
+    if isinstance(key_pair, MultiPrimeKey):
+        # One exponentiation per prime, combined one prime at a time (Garner's method)
+        signature = powmod(hashed, key_pair.exponents[0], key_pair.primes[0])
+        product = key_pair.primes[0]
+        for prime, exponent, coefficient in zip(key_pair.primes[1:], key_pair.exponents[1:],
+                                                key_pair.coefficients[1:]):
+            residue = powmod(hashed, exponent, prime)
+            signature += product * (((residue - signature) * coefficient) % prime)
+            product *= prime
+        if powmod(signature, key_pair.e, key_pair.n) != hashed % key_pair.n:
+            raise ValueError("[Error] Multi-prime CRT signature failed the consistency check.")
+        return signature
+    p, q = key_pair.p, key_pair.q
+    dp, dq, qinv = crt_parameters(key_pair)
+    first = powmod(hashed, dp, p)
+    second = powmod(hashed, dq, q)
+    signature = second + q * ((qinv * (first - second)) % p)
+    if powmod(signature, key_pair.e, key_pair.n) != hashed % key_pair.n:
+        raise ValueError("[Error] CRT signature failed the consistency check.")
+    return signature
+
+
+def crt_parameters(key_pair):
+    """
+        Method gets dp = d mod (p - 1), dq = d mod (q - 1) and qinv = q^-1 mod p of a two prime key pair
+            - worked out the first time the key pair signs and kept in crt_cache, which holds the last
+              crt_cache_size key pairs
+
+        @param:
+            key_pair : the key pair that signs
+
+        @return:
+            dp, dq, qinv : the CRT parameters
+    """
+    key = (int(key_pair.n), int(key_pair.d))
+    with crt_cache_lock:
+        parameters = crt_cache.get(key)
+    if parameters is None:
+        p, q, d = int(key_pair.p), int(key_pair.q), int(key_pair.d)
+        parameters = (d % (p - 1), d % (q - 1), pow(q, -1, p))
+        with crt_cache_lock:
+            crt_cache[key] = parameters
+            while len(crt_cache) > crt_cache_size:
+                del crt_cache[next(iter(crt_cache))]
+    return parameters
+
+
+def save_key(key_pair):
+    """
+        Method saves a key pair so that it can be reused instead of generated again
+            - Stored as keystore/<bit size>/<fingerprint>.pem, the fingerprint being the start of the sha256 of (n, e)
+
+        @param:
+            key_pair : the key pair to save
+
+        @return:
+            path : the path of the saved key pair
+    """
+    n_bytes = key_pair.n.to_bytes((key_pair.n.bit_length() + 7) // 8, byteorder='big')
+    e_bytes = key_pair.e.to_bytes((key_pair.e.bit_length() + 7) // 8, byteorder='big')
+    fingerprint = sha256(n_bytes + b':' + e_bytes).hexdigest()[:16]
+    folder = os.path.join(keystore_directory, str(key_pair.size_in_bits()))
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, fingerprint + '.pem')
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:
+        file.write(key_pair.export_key(format='PEM'))
+    return path
+
+
+def load_key(current_bit_size):
+    """
+        Method loads the oldest saved key pair of a bit size
+
+        @param:
+            current_bit_size : the bit size of the key pair
+
+        @return:
+            key_pair : the saved key pair, None if there is none of that size
+    """
+    folder = os.path.join(keystore_directory, str(current_bit_size))
+    try:
+        paths = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.pem')]
+    except FileNotFoundError:
+        return None
+    if not paths:
+        return None
+    with open(min(paths, key=os.path.getmtime), 'rb') as file:
+        return RSA.import_key(file.read())
+
+
+def new_hasher(digest_name=None):
+    """
+        Method makes a hash object of a digest
+
+        @param:
+            digest_name : the name of the digest, one of digests. The global digest if None
+
+        @return:
+            hasher : the hash object
+    """
+    digest_name = digest_name or digest
+    if digest_name not in digests:
+        raise ValueError("[Error] Unsupported digest: " + str(digest_name))
+    return digests[digest_name]()
+
+
 def signing(key_pair, data):
     """
         Method signs a message that is entered by a user:
             - encrypts the message by calculating its hash and raising to the power 'd' modulo 'n'
+            - uses the Chinese Remainder Theorem to do so when the global crt is True
+            - the hash is made with the global digest
 
         @param:
             key_pair : the key pair that was generated earlier. Used to create a hash
@@ -60,9 +385,13 @@ def signing(key_pair, data):
         @return:
             signature : the generated signature
     """
-    message_digest = str.encode(data)
-    hashed = int.from_bytes(sha512(message_digest).digest(), byteorder='big')
-    signature = pow(hashed, key_pair.d, key_pair.n)
+    hasher = new_hasher()
+    hasher.update(str.encode(data))
+    hashed = int.from_bytes(hasher.digest(), byteorder='big')
+    if crt:
+        signature = crt_signing(hashed, key_pair)
+    else:
+        signature = powmod(hashed, key_pair.d, key_pair.n)
 
     return signature
 
@@ -82,9 +411,10 @@ def verify(signature, key_pair, new_data, comparing):
         @return:
             Boolean :  True if the original hash matches the new hash, False otherwise
     """
-    valid_signature = str.encode(new_data)
-    hashed = int.from_bytes(sha512(valid_signature).digest(), byteorder='big')
-    hash_from_signature = pow(signature, key_pair.e, key_pair.n)
+    hasher = new_hasher()
+    hasher.update(str.encode(new_data))
+    hashed = int.from_bytes(hasher.digest(), byteorder='big')
+    hash_from_signature = powmod(signature, key_pair.e, key_pair.n)
     if not comparing:
         print("\n[Hash of sent data]: \n", hash_from_signature)
         print("\n[Hash of received data]: \n", hashed)
@@ -95,6 +425,370 @@ def verify(signature, key_pair, new_data, comparing):
         return "[Invalid]"
 
 
+def hash_file(path, digest_name=None):
+    """
+        Method hashes a file by memory mapping it and feeding it to the digest one megabyte at a time
+            - Memory use stays the same no matter how big the file is
+
+        @param:
+            path : the path of the file
+            digest_name : the name of the digest, one of digests. The global digest if None
+
+        @return:
+            hashed : the hash value of the file
+    """
+    hasher = new_hasher(digest_name)
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size > 0:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, len(view), 1 << 20):
+                        hasher.update(view[offset:offset + (1 << 20)])
+    return int.from_bytes(hasher.digest(), byteorder='big')
+
+
+def sign_file(path, key_pair=None):
+    """
+        Method signs a file with a newly generated key pair and writes a detached signature next to it
+            - The signature file is the path of the file with '.sig' added
+            - Each line of it is 'name: value' with the digest name, public key (n, e) and signature in hex
+
+        @param:
+            path : the path of the file being signed
+            key_pair : the key pair to sign with instead of a newly generated one
+
+        @return:
+            signature_path : the path of the signature file
+    """
+    is_generated = key_pair is None
+    if is_generated:
+        key_pair = generate(False)
+    hashed = hash_file(path)
+    if crt:
+        signature = crt_signing(hashed, key_pair)
+    else:
+        signature = powmod(hashed, key_pair.d, key_pair.n)
+    signature_path = path + '.sig'
+    with open(signature_path, 'w') as file:
+        file.write("digest: " + digest + "\n")
+        file.write("n: " + format(key_pair.n, 'x') + "\n")
+        file.write("e: " + format(key_pair.e, 'x') + "\n")
+        file.write("signature: " + format(signature, 'x') + "\n")
+    if is_generated:
+        print("\n[Signature]: \n", signature)
+    return signature_path
+
+
+def verify_file(path, key_pair):
+    """
+        Method verifies a file against the detached signature next to it
+            - The public key stored in the signature file is never trusted since anyone can re-sign a changed file
+              with a key of their own. A signature made with another key than the trusted one is not valid
+
+        @param:
+            path : the path of the file being checked
+            key_pair : the key pair, or public key, of the signer that is trusted
+
+        @return:
+            Boolean :  True if the signature is valid for the file, False otherwise
+    """
+    if key_pair is None:
+        raise ValueError("[Error] A trusted public key is needed to verify a file.")
+    fields = {}
+    with open(path + '.sig') as file:
+        for line in file:
+            name, separator, value = line.partition(':')
+            if separator:
+                fields[name.strip()] = value.strip()
+    if fields.get('digest') not in digests:
+        raise ValueError("[Error] Unsupported digest: " + str(fields.get('digest')))
+    e, n = key_pair.e, key_pair.n
+    if (int(fields['e'], 16), int(fields['n'], 16)) != (e, n):
+        return False
+    hash_from_signature = powmod(int(fields['signature'], 16), e, n)
+    return hash_file(path, fields['digest']) == hash_from_signature
+
+
+def make_signer(key_pair):
+    """
+        Method gets a function that signs hashes with one key pair, with everything that does not depend on the hash
+        worked out once so that signing millions of messages only pays for the exponentiations
+
+        @param:
+            key_pair : the key pair that signs
+
+        @return:
+            sign : method called as sign(hashed) that returns the signature
+    """
+    n, e, d = int(key_pair.n), int(key_pair.e), int(key_pair.d)
+    if not crt:
+        return lambda hashed: powmod(hashed, d, n)
+    if isinstance(key_pair, MultiPrimeKey):
+        return lambda hashed: crt_signing(hashed, key_pair)
+    p, q = int(key_pair.p), int(key_pair.q)
+    dp, dq, qinv = crt_parameters(key_pair)
+
+    def sign(hashed):
+        first = powmod(hashed, dp, p)
+        second = powmod(hashed, dq, q)
+        signature = second + q * ((qinv * (first - second)) % p)
+        if powmod(signature, e, n) != hashed % n:
+            raise ValueError("[Error] CRT signature failed the consistency check.")
+        return signature
+
+    return sign
+
+
+def read_records(stream, framing):
+    """
+        Method reads messages from a binary stream one at a time
+            - 'lines' : every line is a message, without its ending newline
+            - 'length' : every message is a 4 byte big-endian length followed by that many bytes
+
+        @param:
+            stream : the binary stream, such as stdin
+            framing : 'lines' or 'length'
+
+        @return:
+            records : generator of every message as bytes
+    """
+    if framing == 'lines':
+        for line in stream:
+            yield line[:-1] if line.endswith(b'\n') else line
+        return
+    while True:
+        header = stream.read(4)
+        if not header:
+            return
+        length = int.from_bytes(header, byteorder='big') if len(header) == 4 else -1
+        record = stream.read(length) if length >= 0 else b''
+        if length < 0 or len(record) != length:
+            raise ValueError("[Error] The input ended in the middle of a message.")
+        yield record
+
+
+def frame_signed(signature, record, framing):
+    """
+        Helper method:
+            1. sign_records(key_pair, records, framing, digest_name)
+            2. stream_sign(key_pair, records, output, framing, num_workers, chunk)
+            - frames a signed message the way stream_verify() reads it back, so the output of sign can be verified
+
+        @param:
+            signature : the signature as an integer
+            record : the message as bytes
+            framing : 'lines' or 'length'
+
+        @return:
+            framed : the signature in hex, a tab, the message and a newline, or with 'length' the message and then the
+                     signature in hex, both with a length before them
+    """
+    signature = format(signature, 'x').encode()
+    if framing == 'lines':
+        return signature + b'\t' + record + b'\n'
+    return (len(record).to_bytes(4, byteorder='big') + record +
+            len(signature).to_bytes(4, byteorder='big') + signature)
+
+
+def sign_records(key_pair, records, framing, digest_name=None):
+    """
+        Helper method: stream_sign(key_pair, records, output, framing, num_workers, chunk)
+            - signs a chunk of messages, on a worker process when there is more than one
+
+        @param:
+            key_pair : the key pair that signs, or (n, e, d, p, q) on a worker process
+            records : list of the messages as bytes
+            framing : 'lines' or 'length'
+            digest_name : the name of the digest, passed in since a worker process does not share the global one
+
+        @return:
+            framed : every message with its signature from frame_signed(), joined together
+    """
+    if isinstance(key_pair, tuple):
+        key_pair = RSA.construct(key_pair)
+    sign = make_signer(key_pair)
+    base_hasher = new_hasher(digest_name)
+    framed = []
+    for record in records:
+        hasher = base_hasher.copy()
+        hasher.update(record)
+        framed.append(frame_signed(sign(int.from_bytes(hasher.digest(), byteorder='big')), record, framing))
+    return b''.join(framed)
+
+
+def stream_sign(key_pair, records, output, framing='lines', num_workers=1, chunk=1024):
+    """
+        Method signs every message and writes it with its signature in hex, in order, framed the same way that
+        stream_verify() reads them, so the output of sign can be piped straight into verify
+            - 'lines' : every line is the signature in hex, a tab and then the message
+            - 'length' : every message is followed by its signature in hex, both with a length before them
+            - With more than one worker, chunks of messages are signed on worker processes. Only a few chunks are
+              read ahead of the one being written, so memory use does not grow with the input
+
+        @param:
+            key_pair : the key pair that signs
+            records : iterable of the messages as bytes
+            output : the binary stream the signed messages are written to
+            framing : 'lines' or 'length'
+            num_workers : the number of worker processes, 1 to sign in this process
+            chunk : the number of messages in a chunk
+    """
+    if num_workers <= 1 or isinstance(key_pair, MultiPrimeKey):
+        sign = make_signer(key_pair)
+        base_hasher = new_hasher()
+        for record in records:
+            hasher = base_hasher.copy()
+            hasher.update(record)
+            output.write(frame_signed(sign(int.from_bytes(hasher.digest(), byteorder='big')), record, framing))
+        return
+
+    numbers = tuple(int(value) for value in (key_pair.n, key_pair.e, key_pair.d, key_pair.p, key_pair.q))
+    records = iter(records)
+    pending = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        while True:
+            while len(pending) < num_workers * 2:
+                records_chunk = [record for index, record in zip(range(chunk), records)]
+                if not records_chunk:
+                    break
+                pending.append(executor.submit(sign_records, numbers, records_chunk, framing, digest))
+            if not pending:
+                return
+            output.write(pending.pop(0).result())
+
+
+def stream_verify(key_pair, records, output, framing):
+    """
+        Method verifies signed messages and writes 'valid' or 'invalid' for each on its own line
+            - 'lines' : every line is the signature in hex, a tab and then the message
+            - 'length' : every message is followed by its signature in hex, both with a length before them
+
+        @param:
+            key_pair : the key pair, or just the public key, that the messages were signed with
+            records : iterable of the messages as bytes from read_records()
+            output : the binary stream the results are written to
+            framing : 'lines' or 'length'
+
+        @return:
+            count : the number of messages that were checked
+            invalid : the number of signatures that were not valid
+    """
+    n, e = int(key_pair.n), int(key_pair.e)
+    base_hasher = new_hasher()
+    count = 0
+    invalid = 0
+    records = iter(records)
+    for record in records:
+        if framing == 'lines':
+            signature, separator, message = record.partition(b'\t')
+            if not separator:
+                raise ValueError("[Error] Line " + str(count + 1) + " has no tab between the signature and message.")
+        else:
+            message, signature = record, next(records, None)
+            if signature is None:
+                raise ValueError("[Error] Message " + str(count + 1) + " has no signature after it.")
+        hasher = base_hasher.copy()
+        hasher.update(message)
+        try:
+            is_valid = powmod(int(signature, 16), e, n) == int.from_bytes(hasher.digest(), byteorder='big')
+        except ValueError:
+            is_valid = False
+        output.write(b'valid\n' if is_valid else b'invalid\n')
+        count += 1
+        invalid += not is_valid
+    return count, invalid
+
+
+def headless(argv):
+    """
+        Main method when the program is run with arguments: does one thing without asking for anything and exits
+            - sign, verify : reads messages from stdin or a file and streams the results to stdout
+            - sign_file, verify_file : same as the --sign_file and --verify_file commands
+
+        @param:
+            argv : the command line arguments
+
+        @return:
+            status : 0 on success, 1 if a signature was not valid, 2 on an error
+    """
+    global bit_size, crt, digest
+    parser = argparse.ArgumentParser(description="Signs and verifies messages without the prompts. "
+                                                 "Run without arguments for the prompts.")
+    parser.add_argument('--key', help="PEM file of the key pair to use. A new one is generated for signing if not "
+                                      "given")
+    parser.add_argument('--save_key', help="write the key pair that was used to this PEM file. Needed to sign without "
+                                           "--key")
+    parser.add_argument('--bit_size', type=int, default=bit_size,
+                        help="bit size of a generated key pair, ignored with --key")
+    parser.add_argument('--no_crt', action='store_true', help="sign without the Chinese Remainder Theorem")
+    parser.add_argument('--digest', choices=list(digests), default=digest,
+                        help="digest the messages are hashed with. verify_file uses the one in the signature file")
+    commands_parser = parser.add_subparsers(dest='command', required=True)
+    for name, description in (('sign', "sign every message, writing it after its signature in hex, as verify reads"),
+                              ('verify', "verify every message, writing 'valid' or 'invalid' per line")):
+        command_parser = commands_parser.add_parser(name, help=description)
+        command_parser.add_argument('--input', default='-', help="file of messages, - for stdin")
+        command_parser.add_argument('--framing', choices=('lines', 'length'), default='lines',
+                                    help="one message per line, or each message after a 4 byte big-endian length")
+        if name == 'sign':
+            command_parser.add_argument('--workers', type=int, default=1,
+                                        help="number of worker processes that sign, 1 to sign in this process")
+    commands_parser.add_parser('sign_file', help="sign a file, writing <file>.sig").add_argument('path')
+    commands_parser.add_parser('verify_file', help="verify a file against <file>.sig").add_argument('path')
+    arguments = parser.parse_args(argv)
+
+    # The bit size is only used to generate a key pair, so it is ignored along with --key
+    if not arguments.key:
+        if not bit_size_checking(arguments.bit_size):
+            parser.error("[Error] Incorrect type. Try an integer that is a multiple of 1024.")
+        bit_size = arguments.bit_size
+    crt = not arguments.no_crt
+    digest = arguments.digest
+    try:
+        key_pair = None
+        if arguments.key:
+            with open(arguments.key, 'rb') as file:
+                key_pair = RSA.import_key(file.read())
+        elif arguments.command in ('sign', 'sign_file'):
+            # A generated key pair that is not kept would make signatures that nobody can ever verify
+            if not arguments.save_key:
+                parser.error("[Error] " + arguments.command + " needs the key pair to sign with, given with --key, "
+                             "or --save_key to keep the one that is generated")
+            key_pair = RSA.generate(bits=bit_size)
+        elif arguments.command in ('verify', 'verify_file'):
+            parser.error("[Error] " + arguments.command + " needs the public key of the signer, given with --key")
+        if key_pair is not None and arguments.save_key:
+            with open(os.open(arguments.save_key, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:
+                file.write(key_pair.export_key(format='PEM'))
+
+        if arguments.command == 'sign_file':
+            print(sign_file(arguments.path, key_pair))
+            return 0
+        if arguments.command == 'verify_file':
+            is_valid = verify_file(arguments.path, key_pair)
+            print("valid" if is_valid else "invalid")
+            return 0 if is_valid else 1
+
+        if arguments.command == 'sign' and not key_pair.has_private():
+            parser.error("[Error] signing needs a private key")
+        source = sys.stdin.buffer if arguments.input == '-' else open(arguments.input, 'rb', buffering=1 << 16)
+        # Results are written in large blocks instead of a line at a time, the last block when the input ends
+        with source, open(sys.stdout.fileno(), 'wb', buffering=1 << 16, closefd=False) as output:
+            records = read_records(source, arguments.framing)
+            if arguments.command == 'sign':
+                stream_sign(key_pair, records, output, arguments.framing, arguments.workers)
+                return 0
+            count, invalid = stream_verify(key_pair, records, output, arguments.framing)
+            return 1 if invalid else 0
+    except BrokenPipeError:
+        # The reader stopped early, such as head; nothing more can be written to stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (OSError, ValueError, IndexError, KeyError) as error:
+        print(error, file=sys.stderr)
+        return 2
+
+
 def digital_signature_runner(text, is_valid_input, comparing):
     """
         Method that generates and validates digital signatures
@@ -193,28 +887,240 @@ def comparing_helper(current_bit_size, text, is_valid_text):
     global bit_size
     bit_size = int(current_bit_size)
     print("\n [Validating] ")
-    start = time.time()
+    start = time.perf_counter()
     is_valid = digital_signature_runner(text, is_valid_text, True)
-    end = time.time()
+    end = time.perf_counter()
     run_time = (end - start)
     return run_time, is_valid
 
 
-def find_average_time(text, is_valid_text):
+def compare_crt(text):
+    """
+        Method compares the time it takes to sign the same data with and without the Chinese Remainder Theorem
+            - Both are signed with the same key pair of the current bit size
+
+        @param:
+            text : the data that is being signed
+
+        @print:
+            - signing time with the Chinese Remainder Theorem
+            - signing time with the full private exponent
+    """
+    global crt
+    temp_crt = crt
+    key_pair = generate(True)
+
+    crt = True
+    start = time.perf_counter()
+    signing(key_pair, text)
+    crt_time = time.perf_counter() - start
+
+    crt = False
+    start = time.perf_counter()
+    signing(key_pair, text)
+    plain_time = time.perf_counter() - start
+
+    print("\n [With CRT]:", crt_time, " [Without CRT]: ", plain_time, " [key pair size]: ", bit_size,
+          " [Arithmetic]: ", arithmetic_backend)
+    crt = temp_crt
+
+
+class LatencyHistogram:
+    """
+        Histogram of run times with logarithmic buckets, like an HDR histogram, so it uses the same memory however
+        many times are recorded
+            - Times are counted in nanoseconds. Below 2 ** significant_bits every nanosecond has its own bucket, above
+              that every power of two is split into 2 ** (significant_bits - 1) buckets, so a percentile is off by
+              less than 1 / 2 ** (significant_bits - 1) of itself (1.6% by default)
+            - The number of times, their total and the fastest and slowest are kept exactly, so the mean, min and
+              max are not rounded to a bucket
+            - Each thread or worker process records into its own and they are merged once all of them are done, so
+              recording never waits on a lock
+
+        @param:
+            significant_bits : the precision of the buckets
+            highest : the slowest time in seconds with its own bucket, slower times are counted in the last one
+    """
+
+    def __init__(self, significant_bits=7, highest=3600):
+        self.significant_bits = significant_bits
+        self.sub_buckets = 1 << significant_bits
+        self.half = self.sub_buckets >> 1
+        self.counts = [0] * (self.bucket_index(int(highest * 1e9)) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.fastest = None
+        self.slowest = None
+
+    def bucket_index(self, nanoseconds):
+        shift = nanoseconds.bit_length() - self.significant_bits
+        if shift <= 0:
+            return nanoseconds
+        return self.sub_buckets + (shift - 1) * self.half + (nanoseconds >> shift) - self.half
+
+    def bucket_value(self, index):
+        # The middle of the times counted in the bucket
+        if index < self.sub_buckets:
+            return index
+        shift, top = divmod(index - self.sub_buckets, self.half)
+        shift += 1
+        return ((top + self.half) << shift) + ((1 << shift) - 1) // 2
+
+    def record(self, seconds):
+        """
+            Method counts one time
+
+            @param:
+                seconds : the time
+        """
+        index = self.bucket_index(max(0, round(seconds * 1e9)))
+        self.counts[min(index, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.fastest is None or seconds < self.fastest:
+            self.fastest = seconds
+        if self.slowest is None or seconds > self.slowest:
+            self.slowest = seconds
+
+    def merge(self, other):
+        """
+            Method adds the times of another histogram to this one
+
+            @param:
+                other : a histogram with the same significant_bits and highest
+
+            @return:
+                self : this histogram
+        """
+        if len(other.counts) != len(self.counts) or other.significant_bits != self.significant_bits:
+            raise ValueError("[Error] Only histograms with the same buckets can be merged.")
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        for seconds in (other.fastest, other.slowest):
+            if seconds is not None:
+                self.fastest = seconds if self.fastest is None else min(self.fastest, seconds)
+                self.slowest = seconds if self.slowest is None else max(self.slowest, seconds)
+        return self
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """
+            Method finds the time that a fraction of the recorded times are at or below
+
+            @param:
+                fraction : between 0 and 1, 0.99 for the p99
+
+            @return:
+                seconds : the time, 0.0 if nothing was recorded
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-fraction * self.count // 1))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and index == len(self.counts) - 1:
+                return self.slowest
+            if seen >= rank:
+                return min(max(self.bucket_value(index) / 1e9, self.fastest), self.slowest)
+        return self.slowest
+
+
+class TrialStatistics:
+    """
+        The histograms of the trials run by one thread or worker process: one of the whole trial and one for each
+        phase of it
+    """
+    phases = ('total', 'keygen', 'sign', 'verify')
+
+    def __init__(self):
+        self.histograms = {phase: LatencyHistogram() for phase in self.phases}
+
+    def record(self, phase, seconds):
+        self.histograms[phase].record(seconds)
+
+    def merge(self, other):
+        for phase in self.phases:
+            self.histograms[phase].merge(other.histograms[phase])
+        return self
+
+    def mean(self):
+        return self.histograms['total'].mean()
+
+
+def merge_statistics(all_statistics):
+    """
+        Method merges the statistics of every thread or worker process once they are all done
+
+        @param:
+            all_statistics : the TrialStatistics of each thread or worker process
+
+        @return:
+            merged : one TrialStatistics of all the trials
+    """
+    merged = TrialStatistics()
+    for statistics in all_statistics:
+        merged.merge(statistics)
+    return merged
+
+
+def print_statistics(statistics):
+    """
+        Method prints the mean, fastest, slowest and percentiles of a trial and of each phase of it
+
+        @param:
+            statistics : the merged TrialStatistics
+    """
+    for phase in statistics.phases:
+        histogram = statistics.histograms[phase]
+        print("  [" + phase + "] mean: %.6f  min: %.6f  p50: %.6f  p95: %.6f  p99: %.6f  max: %.6f" % (
+            histogram.mean(), histogram.fastest or 0.0, histogram.percentile(0.5), histogram.percentile(0.95),
+            histogram.percentile(0.99), histogram.slowest or 0.0))
+
+
+def timed_signature_runner(text, is_valid_text, statistics):
+    """
+        Method generates and validates a digital signature like digital_signature_runner, timing each phase
+
+        @param:
+            text : the original data
+            is_valid_text : the data that might have been altered
+            statistics : the TrialStatistics of the thread or worker process the times are recorded in
+
+        @return:
+            run_time : the time it took for the creation and validation
+    """
+    start = time.perf_counter()
+    generated_key_pair = generate(True)
+    generated = time.perf_counter()
+    signature = signing(generated_key_pair, text)
+    signed = time.perf_counter()
+    verify(signature, generated_key_pair, is_valid_text, True)
+    end = time.perf_counter()
+    statistics.record('keygen', generated - start)
+    statistics.record('sign', signed - generated)
+    statistics.record('verify', end - signed)
+    statistics.record('total', end - start)
+    return end - start
+
+
+def find_average_time(text, is_valid_text, statistics):
     """
         Helper method to find average time of certain bit size/byte size of data.
-            - Is method call from threading --> updates global variable instead of returning anything
+            - Is method call from threading --> records into the statistics of its own thread instead of returning
+              anything, so no two threads write to the same place
 
         @param:
             text : The data that was sent
             is_valid_text : The data that was received
+            statistics : the TrialStatistics of this thread
     """
-    global average_time
-    start_time = time.time()
-    digital_signature_runner(text, is_valid_text, True)
-    end_time = time.time()
-    average = (end_time - start_time)
-    average_time += average
+    timed_signature_runner(text, is_valid_text, statistics)
 
 
 def threading(text, is_valid_text, num, single_thread):
@@ -238,91 +1144,525 @@ def threading(text, is_valid_text, num, single_thread):
             - The average time
             - Sent/Received data size in bytes
             - Number of threads created
+            - The mean, min, max and percentiles of a trial and of each phase of it
+
+        @return:
+            average_time : the average time of a trial
+            bit_size : the bit size that was used
+            statistics : the TrialStatistics of all the trials
     """
-    global average_time
-    average_time = 0
     threads = []
-    for n in range(num):
+    all_statistics = [TrialStatistics() for n in range(num)]
+    for statistics in all_statistics:
         if single_thread:
             print("[Validating]\n")
-        thread = Thread(target=find_average_time, args=(text, is_valid_text))
+        thread = Thread(target=find_average_time, args=(text, is_valid_text, statistics))
         thread.start()
         threads.append(thread)
 
     for t in threads:
         t.join()
 
-    average_time /= num
+    statistics = merge_statistics(all_statistics)
+    average_time = statistics.mean()
     sent_byte_size = len(text.encode('utf-8'))
     received_byte_size = len(is_valid_text.encode('utf-8'))
     print("[Average time] : ", average_time, ' [Sent data size] :', sent_byte_size, ' bytes  [Received data size] : ',
           received_byte_size, ' bytes [Runs] : ', num, " [key pair size]: ", bit_size)
-    return average_time, bit_size
+    print_statistics(statistics)
+    return average_time, bit_size, statistics
+
+
+def timed_trial(text, is_valid_text, current_bit_size, use_crt, prime_count=2, digest_name='sha512',
+                statistics=None):
+    """
+        Helper method: trial_batch(text, is_valid_text, current_bit_size, use_crt, prime_count, digest_name, count)
+            - runs one trial inside a worker process and times it there, so the time does not include waiting
+            - the globals are passed in since a worker process does not share them
+
+        @param:
+            text : The data that was sent
+            is_valid_text : The data that was received
+            current_bit_size : the bit size of the key pair
+            use_crt : boolean whether signing uses the Chinese Remainder Theorem
+            prime_count : the number of primes in the modulus
+            digest_name : the name of the digest the data is hashed with
+            statistics : the TrialStatistics the time of each phase is recorded in, None to only return the time
+
+        @return:
+            run_time : the time it took for the creation and validation
+    """
+    global bit_size, crt, primes, parallel_keygen, digest
+    bit_size = current_bit_size
+    crt = use_crt
+    primes = prime_count
+    digest = digest_name
+    # The trial already runs in a worker process, which cannot start a pool of its own
+    parallel_keygen = False
+    return timed_signature_runner(text, is_valid_text, statistics or TrialStatistics())
+
+
+def trial_batch(text, is_valid_text, current_bit_size, use_crt, prime_count, digest_name, count):
+    """
+        Helper method: process_pool(text, is_valid_text, num, single_thread)
+            - runs a number of trials inside one worker process, recording them in statistics of its own
+
+        @param:
+            count : the number of trials to run
+            The rest are the same as timed_trial
+
+        @return:
+            statistics : the TrialStatistics of the trials
+    """
+    statistics = TrialStatistics()
+    for n in range(count):
+        timed_trial(text, is_valid_text, current_bit_size, use_crt, prime_count, digest_name, statistics)
+    return statistics
+
+
+def process_pool(text, is_valid_text, num, single_thread):
+    """
+        Main method to find average time using worker processes. Same as threading but:
+            - Trials are spread over worker processes so that key generation and pow() run on every core
+              instead of waiting on each other for the GIL
+            - Each trial is timed inside its worker, which sends back the histograms of a batch of trials instead
+              of every time
+
+        @param:
+            text : The data that was sent
+            is_valid_text : The data that was received
+            num : the number of trials to run
+            single_thread : boolean value on whether to print if it is validating
+
+        @print:
+            - The average, fastest and slowest time of a trial
+            - Signatures per second over the whole run
+            - Sent/Received data size in bytes
+            - Number of trials and worker processes
+            - The mean, min, max and percentiles of a trial and of each phase of it
+
+        @return:
+            average_time : the average time of a trial
+            bit_size : the bit size that was used
+            statistics : the TrialStatistics of all the trials
+    """
+    num_of_workers = workers or os.cpu_count() or 1
+    if single_thread:
+        print("[Validating]\n")
+    # A few batches for every worker, so a worker that gets slow key pairs does not hold up the others for long
+    batch_size = max(1, num // (num_of_workers * 4))
+    counts = [min(batch_size, num - n) for n in range(0, num, batch_size)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_of_workers) as executor:
+        statistics = merge_statistics(executor.map(
+            trial_batch, [text] * len(counts), [is_valid_text] * len(counts), [bit_size] * len(counts),
+            [crt] * len(counts), [primes] * len(counts), [digest] * len(counts), counts))
+    wall_time = time.perf_counter() - start
+
+    trial_average_time = statistics.mean()
+    total = statistics.histograms['total']
+    sent_byte_size = len(text.encode('utf-8'))
+    received_byte_size = len(is_valid_text.encode('utf-8'))
+    print("[Average time] : ", trial_average_time, ' [Fastest] : ', total.fastest, ' [Slowest] : ', total.slowest,
+          ' [Signatures per second] : ', num / wall_time, ' [Sent data size] :', sent_byte_size,
+          ' bytes  [Received data size] : ', received_byte_size, ' bytes [Runs] : ', num, ' [Workers] : ',
+          num_of_workers, " [key pair size]: ", bit_size, " [Arithmetic]: ", arithmetic_backend)
+    print_statistics(statistics)
+    return trial_average_time, bit_size, statistics
+
+
+def find_averages(text, is_valid_text, num, single_thread):
+    """
+        Method to find average time using worker processes or threads, based on the global processes
+
+        @param:
+            text : The data that was sent
+            is_valid_text : The data that was received
+            num : the number of trials to run
+            single_thread : boolean value on whether to print if it is validating
+
+        @return:
+            average_time : the average time of a trial
+            bit_size : the bit size that was used
+            statistics : the TrialStatistics of all the trials
+    """
+    if processes:
+        return process_pool(text, is_valid_text, num, single_thread)
+    return threading(text, is_valid_text, num, single_thread)
+
+
+def sweep_settings(text, trials, prime_count, use_crt, digest_name, engine, worker_count, use_parallel_keygen,
+                   backend):
+    """
+        Method describes what the times of a sweep depend on, so that a sweep is only resumed with the same ones
+
+        @param:
+            text : The data that is signed
+            trials : the number of trials of every bit size
+            prime_count : the number of primes in the modulus
+            use_crt : boolean whether signing uses the Chinese Remainder Theorem
+            digest_name : the name of the digest the data is hashed with
+            engine : what runs the trials, 'processes', 'threads' or 'distributed'
+            worker_count : the number of worker processes or threads the trials share, None if it is not known
+            use_parallel_keygen : boolean whether p and q are searched for at the same time during the trials
+            backend : the arithmetic backend, None if it is not known
+
+        @return:
+            settings : dictionary of the settings, with the sha256 of the text instead of the text
+    """
+    return {'text_sha256': sha256(text.encode('utf-8')).hexdigest(), 'trials': trials, 'primes': prime_count,
+            'crt': use_crt, 'digest': digest_name, 'engine': engine, 'workers': worker_count,
+            'parallel_keygen': use_parallel_keygen, 'arithmetic': backend}
+
+
+def current_sweep_settings(text, trials):
+    """
+        Helper method: multiple_average_tests(number_of_runs, text, num_of_threads, ...)
+            - gets the sweep_settings of the globals, as find_averages would use them
+            - trials on worker processes never search for p and q at the same time, see timed_trial
+
+        @param:
+            text : The data that is signed
+            trials : the number of trials of every bit size
+
+        @return:
+            settings : the sweep_settings
+    """
+    if processes:
+        return sweep_settings(text, trials, primes, crt, digest, 'processes', workers or os.cpu_count() or 1, False,
+                              arithmetic_backend)
+    return sweep_settings(text, trials, primes, crt, digest, 'threads', trials, parallel_keygen, arithmetic_backend)
+
+
+class ResultsSink:
+    """
+        Writes the results of the multiple averages to a csv file as each bit size finishes
+            - One row per bit size: bit_size, average_time, runs, timestamp
+            - The file is flushed to disk every sync_every rows, so an interrupted sweep keeps what it finished
+            - A row that was only partly written when the sweep was interrupted is dropped when the file is opened
+            - The settings of the sweep are kept next to it in <path>.settings.json. A file made with other settings
+              is not resumed, it is moved aside to <name>-<time>.csv and the file is started over
+
+        @param:
+            path : the csv file
+            settings : the sweep_settings of the sweep, None to not check them
+            sync_every : the number of rows between each time the file is flushed to disk
+            resume : boolean whether rows already in the file are kept. False starts the file over
+    """
+    fields = ('bit_size', 'average_time', 'runs', 'timestamp')
+
+    def __init__(self, path, settings=None, sync_every=1, resume=True):
+        self.path = path
+        self.settings_path = path + '.settings.json'
+        self.sync_every = sync_every
+        self.unsynced = 0
+        if resume and os.path.exists(path) and settings is not None and self.stored_settings() != settings:
+            print("\n [Note]", path, "was made with other settings, it was moved to", self.move_aside(),
+                  "and the sweep starts over")
+            resume = False
+        self.resumed = resume and os.path.exists(path)
+        if not self.resumed:
+            with open(path, 'w', newline='') as file:
+                csv.writer(file).writerow(self.fields)
+            if settings is not None:
+                with open(self.settings_path, 'w') as file:
+                    json.dump(settings, file, indent=2)
+        else:
+            self.drop_partial_row()
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+
+    def stored_settings(self):
+        try:
+            with open(self.settings_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def move_aside(self):
+        name, extension = os.path.splitext(self.path)
+        moved = name + '-' + time.strftime('%Y%m%d-%H%M%S') + extension
+        os.replace(self.path, moved)
+        if os.path.exists(self.settings_path):
+            os.replace(self.settings_path, moved + '.settings.json')
+        return moved
+
+    def drop_partial_row(self):
+        with open(self.path, 'rb+') as file:
+            content = file.read()
+            if content and not content.endswith(b'\n'):
+                file.truncate(content.rfind(b'\n') + 1)
+
+    def completed(self):
+        """
+            Method gets the bit sizes that are already in the file
+
+            @return:
+                completed : dictionary of bit_size -> average_time
+        """
+        with open(self.path, newline='') as file:
+            return {int(row['bit_size']): float(row['average_time']) for row in csv.DictReader(file)}
+
+    def append(self, current_bit_size, current_average_time, runs):
+        self.writer.writerow((current_bit_size, current_average_time, runs, time.time()))
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+def export_workbook(results_path, workbook_path):
+    """
+        Method writes the results in a csv file to an excel workbook to easily create graph and view data
+            - .xls files are written with xlwt, .xlsx files with openpyxl, if they are installed
+
+        @param:
+            results_path : the csv file written by ResultsSink
+            workbook_path : the workbook to write, ending in .xls or .xlsx
+    """
+    with open(results_path, newline='') as file:
+        rows = [(int(row['bit_size']), float(row['average_time'])) for row in csv.DictReader(file)]
+
+    if workbook_path.endswith('.xlsx'):
+        try:
+            from openpyxl import Workbook as XlsxWorkbook
+        except ImportError:
+            raise ValueError("[Error] openpyxl is needed to write .xlsx files.")
+        wb = XlsxWorkbook()
+        sheet1 = wb.active
+        sheet1.append(("Bit size", "Average time"))
+        for row in rows:
+            sheet1.append(row)
+        wb.save(workbook_path)
+        return
+
+    if Workbook is None:
+        raise ValueError("[Error] xlwt is needed to write .xls files.")
+    wb = Workbook()
+    sheet1 = wb.add_sheet('Sheet_1', cell_overwrite_ok=True)
+    sheet1.write(0, 0, "Bit size")
+    sheet1.write(0, 1, "Average time")
+    for n, (curr_bit_size, curr_average_time) in enumerate(rows):
+        sheet1.write(n + 1, 0, curr_bit_size)
+        sheet1.write(n + 1, 1, curr_average_time)
+    wb.save(workbook_path)
 
 
-def is_writing_to_workbook(number_of_runs, text, num_of_threads, is_workbook):
+def is_writing_to_workbook(number_of_runs, text, num_of_threads, is_workbook, resume=True):
     """
         Method just to check whether data is being written to an excel file
+            - The results are always streamed to the csv file so an interrupted sweep can be resumed
 
         @param:
             number_of_runs : Number of different bit sizes to enter
             text : The data that was sent/received. Only assuming valid signature for this
             num_of_threads : the number of threads to be created for each bit size
-            is_workbook : Boolean whether data is being written
+            is_workbook : Boolean whether data is also written to a workbook at the end
+            resume : Boolean whether bit sizes already in the results file are skipped
     """
     if is_workbook:
-        write_multiple_average_tests(number_of_runs, text, num_of_threads)
+        write_multiple_average_tests(number_of_runs, text, num_of_threads, resume=resume)
     else:
-        multiple_average_tests(number_of_runs, text, num_of_threads)
+        multiple_average_tests(number_of_runs, text, num_of_threads, resume=resume)
 
 
-def write_multiple_average_tests(number_of_runs, text, num_of_threads):
+def write_multiple_average_tests(number_of_runs, text, num_of_threads, results_path='Averages_1.csv',
+                                 workbook_path='Averages_1.xls', resume=True):
     """
-        Method to run as many tests as desired with as many threads to find the average times.
-        Writes data to an excel file to easily create graph and view data.
+        Method is the same as multiple_average_tests, then writes the results to an excel file to easily create graph
+        and view data.
 
         @param:
             number_of_runs : Number of different bit sizes to enter
             text : The data that was sent/received. Only assuming valid signature for this
             num_of_threads : the number of threads to be created for each bit size
+            results_path : the csv file the results are streamed to
+            workbook_path : the excel file the results are written to at the end, None to only write the csv file
+            resume : Boolean whether bit sizes already in the csv file are skipped instead of starting over
 
         @end:
-            Writes to an excel sheet that is stored in the folder this was ran in
+            Writes to a csv file and an excel sheet that are stored in the folder this was ran in
     """
-    global bit_size
-    temp = bit_size
-    bit_size = 1024
-    wb = Workbook()
-    sheet1 = wb.add_sheet('Sheet_1', cell_overwrite_ok=True)
-    sheet1.write(0, 1, "Bit size")
-    sheet1.write(0, 1, "Average time")
-    for n in range(number_of_runs):
-        print("\n[Validating] :", bit_size)
-        curr_average_time, curr_bit_size = threading(text, text, num_of_threads, False)
-        sheet1.write(n, 1, curr_bit_size)
-        sheet1.write(n, 2, curr_average_time)
-        bit_size += 1024
-    bit_size = temp
-    wb.save('Averages_1.xls')
+    multiple_average_tests(number_of_runs, text, num_of_threads, results_path, workbook_path, resume)
 
 
-def multiple_average_tests(number_of_runs, text, num_of_threads):
+def multiple_average_tests(number_of_runs, text, num_of_threads, results_path='Averages_1.csv', workbook_path=None,
+                           resume=True):
     """
         Method to run as many tests as desired with as many threads to find the average times.
+        Writes each bit size to a csv file as soon as it finishes, so an interrupted sweep can be resumed.
 
         @param:
             number_of_runs : Number of different bit sizes to enter
             text : The data that was sent/received. Only assuming valid signature for this
             num_of_threads : the number of threads to be created for each bit size
+            results_path : the csv file the results are streamed to
+            workbook_path : the excel file the results are written to at the end, None to only write the csv file
+            resume : Boolean whether bit sizes already in the csv file are skipped instead of starting over. They are
+                     only skipped if the file was made with the same text, number of trials, primes, crt, digest,
+                     engine and number of workers, parallel_keygen and arithmetic backend
+
+        @print:
+            - The statistics of each bit size as it finishes
+            - A summary of the mean and percentiles of a trial and the mean of each phase for every bit size
     """
     global bit_size
     temp = bit_size
     bit_size = 1024
-    for n in range(number_of_runs):
-        print("\n[Validating] :", bit_size)
-        threading(text, text, num_of_threads, False)
-        bit_size += 1024
-    bit_size = temp
+    sink = ResultsSink(results_path, current_sweep_settings(text, num_of_threads), resume=resume)
+    completed = sink.completed()
+    results = []
+    try:
+        for n in range(number_of_runs):
+            if bit_size in completed:
+                print("\n[Skipping] :", bit_size, " [Average time] : ", completed[bit_size])
+            else:
+                print("\n[Validating] :", bit_size)
+                curr_average_time, curr_bit_size, statistics = find_averages(text, text, num_of_threads, False)
+                sink.append(curr_bit_size, curr_average_time, num_of_threads)
+                results.append((curr_average_time, curr_bit_size, statistics))
+            bit_size += 1024
+    finally:
+        sink.close()
+        bit_size = temp
+    if results:
+        print_summary(results)
+    if workbook_path:
+        try:
+            export_workbook(results_path, workbook_path)
+        except ValueError as error:
+            print("\n", error, " The results are in: ", results_path)
+
+
+def print_summary(results):
+    """
+        Method prints a table of the mean and percentiles of a trial and the mean of each phase for every bit size
+
+        @param:
+            results : list of (average_time, bit_size, statistics) as returned by find_averages
+    """
+    print("\n [Bit size]   [Mean]     [p50]      [p95]      [p99]      [keygen]   [sign]     [verify]")
+    for curr_average_time, curr_bit_size, statistics in results:
+        total = statistics.histograms['total']
+        print("  %-11d %-10.4f %-10.4f %-10.4f %-10.4f %-10.4f %-10.4f %.4f" % (
+            curr_bit_size, curr_average_time, total.percentile(0.5), total.percentile(0.95), total.percentile(0.99),
+            statistics.histograms['keygen'].mean(), statistics.histograms['sign'].mean(),
+            statistics.histograms['verify'].mean()))
+
+
+# Two-sided 95% Student-t quantiles for 1 to 30 degrees of freedom. With a few trials 1.96 would make the interval
+# several times too narrow, so a bit size could stop as precise after two or three trials
+t_values = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+            2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+            2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def relative_precision(run_times, in_flight=0):
+    """
+        Helper method: adaptive_sweep(text, bit_sizes, target_precision, time_budget, min_trials, max_trials)
+            - gets the half width of the 95% confidence interval of the average, as a fraction of the average
+            - trials that are still running are counted as if they will narrow the interval like the others did
+            - uses the Student-t quantile of the finished trials, 1.96 once there are more than 31 of them
+
+        @param:
+            run_times : the times of the finished trials
+            in_flight : the number of trials that are still running
+
+        @return:
+            precision : the relative half width, infinity if there are not yet two trials
+    """
+    if len(run_times) < 2:
+        return float('inf')
+    mean = statistics.fmean(run_times)
+    t_value = t_values[len(run_times) - 2] if len(run_times) <= len(t_values) + 1 else 1.96
+    half_width = t_value * statistics.stdev(run_times) / (len(run_times) + in_flight) ** 0.5
+    return half_width / mean if mean > 0 else 0.0
+
+
+def adaptive_sweep(text, bit_sizes, target_precision=0.05, time_budget=None, min_trials=3, max_trials=50):
+    """
+        Method finds the average time of several bit sizes at once on worker processes, giving more trials to the
+        bit sizes whose averages are still imprecise.
+            - Every bit size gets at least min_trials trials
+            - After that, each free worker runs a trial of the bit size with the widest confidence interval
+            - A bit size stops once its 95% confidence interval is within target_precision of its average, its trials
+              took time_budget seconds or it ran max_trials trials
+
+        @param:
+            text : The data that was sent/received. Only assuming valid signature for this
+            bit_sizes : the bit sizes to find the averages of
+            target_precision : the half width of the confidence interval to stop at, as a fraction of the average
+            time_budget : the most seconds of trials to spend on each bit size, None for no limit
+            min_trials : the least number of trials per bit size
+            max_trials : the most number of trials per bit size
+
+        @print:
+            - Per bit size the average time, the precision reached, the number of trials and why it stopped
+
+        @return:
+            results : list of (bit size, average time, relative precision, number of trials)
+    """
+    num_of_workers = workers or os.cpu_count() or 1
+    run_times = {size: [] for size in bit_sizes}
+    in_flight = {size: 0 for size in bit_sizes}
+    stopped = {}
+
+    def next_bit_size():
+        waiting = [size for size in bit_sizes if size not in stopped
+                   and len(run_times[size]) + in_flight[size] < max_trials]
+        starting = [size for size in waiting if len(run_times[size]) + in_flight[size] < min_trials]
+        if starting:
+            return min(starting, key=lambda size: len(run_times[size]) + in_flight[size])
+        # A bit size whose running trials should already make it precise enough waits for them to finish
+        waiting = [size for size in waiting if in_flight[size] == 0
+                   or relative_precision(run_times[size], in_flight[size]) > target_precision]
+        if not waiting:
+            return None
+        return max(waiting, key=lambda size: relative_precision(run_times[size], in_flight[size]))
+
+    with ProcessPoolExecutor(max_workers=num_of_workers) as executor:
+        futures = {}
+        while True:
+            while len(futures) < num_of_workers:
+                size = next_bit_size()
+                if size is None:
+                    break
+                futures[executor.submit(timed_trial, text, text, size, crt, primes, digest)] = size
+                in_flight[size] += 1
+            if not futures:
+                break
+
+            finished, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                size = futures.pop(future)
+                in_flight[size] -= 1
+                run_times[size].append(future.result())
+                if size in stopped or len(run_times[size]) < min_trials:
+                    continue
+                if relative_precision(run_times[size]) <= target_precision:
+                    stopped[size] = "precision"
+                elif time_budget is not None and sum(run_times[size]) >= time_budget:
+                    stopped[size] = "time budget"
+                elif len(run_times[size]) >= max_trials:
+                    stopped[size] = "max trials"
+
+    results = []
+    for size in bit_sizes:
+        average = statistics.fmean(run_times[size])
+        precision = relative_precision(run_times[size])
+        results.append((size, average, precision, len(run_times[size])))
+        print("[Bit size] : ", size, " [Average time] : ", average, " [Precision] : +/-",
+              round(precision * 100, 2), "% [Runs] : ", len(run_times[size]), " [Stopped by] : ",
+              stopped.get(size, "precision"))
+    return results
 
 
 def number_checker(num_bit_size):
@@ -352,6 +1692,24 @@ def number_checker(num_bit_size):
                 print("[Error] Incorrect type. Try an integer.")
 
 
+def number_checker_workers():
+    """
+        Method to error check the number of worker processes to ensure that it is a positive number.
+
+        @return:
+            value :  The number of worker processes
+    """
+    while True:
+        num = input("\n@User: Number of worker processes: \n")
+        try:
+            value = int(num)
+            if value > 0:
+                return value
+            print("[Error] Incorrect type. Try an integer larger than 0.")
+        except ValueError:
+            print("[Error] Incorrect type. Try an integer.")
+
+
 def bit_size_checking(some_bit_size):
     """
         Method to error check the bit sizes to ensure that they are bits that are factors of 1024
@@ -412,6 +1770,35 @@ def commands():
                   "--multiple_averages : "
                   "finds the time of multiples averages; prints them to screen and can be written to an excel file\n"
                   
+                  "--change_crt : turns signing with the Chinese Remainder Theorem on or off\n"
+
+                  "--compare_crt : compares the time to sign some data with and without the Chinese Remainder Theorem\n"
+
+                  "--change_engine : switches finding averages between worker processes and threads\n"
+
+                  "--change_workers : can change the number of worker processes used to find averages\n"
+
+                  "--sign_file : signs a file and writes the signature next to it as <file>.sig\n"
+
+                  "--verify_file : verifies a file against the signature next to it with a trusted public key\n"
+
+                  "--change_reuse_key : turns reusing a saved key pair of the bit size on or off\n"
+
+                  "--change_primes : can change the number of primes in the modulus to 2, 3 or 4. "
+                  "3 are only used for bit sizes of 4096 and up, 4 for 8192 and up\n"
+
+                  "--change_digest : can change the digest the data is hashed with to sha256, sha512, sha3_256 or "
+                  "blake2b\n"
+
+                  "--change_parallel_keygen : turns searching for p and q at the same time on worker processes on or "
+                  "off\n"
+
+                  "--export_workbook : writes the results of --multiple_averages in Averages_1.csv to a .xls or .xlsx "
+                  "file\n"
+
+                  "--adaptive_averages : finds the averages of several bit sizes at once, "
+                  "running more trials for the bit sizes whose averages are less precise\n"
+
                   "--exit : exits the program")
 
         elif command == "--run":
@@ -456,17 +1843,116 @@ def commands():
             is_valid_input = input("\n@User: Data that is received: \n")
             num = number_checker(False)
             bit_size = int(get_new_bit_size())
-            threading(text, is_valid_input, num, True)
+            find_averages(text, is_valid_input, num, True)
 
         elif command == "--multiple_averages":
             text = input("\n@User: Data to be sent: \n")
             runs = number_checker(True)
             threads = number_checker(False)
-            is_workbook = input("\n@User: Would you like the data stored in a workbook?\n")
-            if is_workbook.lower() == 'yes' or is_workbook.lower() == 'y':
-                is_writing_to_workbook(runs, text, threads, True)
+            resume = True
+            if os.path.exists('Averages_1.csv'):
+                is_resuming = input("\n@User: Resume from the bit sizes already in Averages_1.csv?\n")
+                resume = is_resuming.lower() == 'yes' or is_resuming.lower() == 'y'
+            is_workbook = input("\n@User: Would you like the data stored in a workbook too?\n")
+            is_writing_to_workbook(runs, text, threads, is_workbook.lower() == 'yes' or is_workbook.lower() == 'y',
+                                   resume)
+
+        elif command == "--adaptive_averages":
+            text = input("\n@User: Data to be sent: \n")
+            runs = number_checker(True)
+            precision = input("\n@User: Precision to stop at, in percent of the average (5 if left empty): \n")
+            budget = input("\n@User: Most seconds to spend on each bit size (no limit if left empty): \n")
+            try:
+                precision = float(precision) / 100 if precision else 0.05
+                budget = float(budget) if budget else None
+                adaptive_sweep(text, [1024 * (n + 1) for n in range(runs)], precision, budget)
+            except ValueError:
+                print("\n [Error] Incorrect type. Try a number.")
+
+        elif command == "--export_workbook":
+            workbook_path = input("\n@User: Workbook to write the results of Averages_1.csv to (.xls or .xlsx): \n")
+            try:
+                export_workbook('Averages_1.csv', workbook_path)
+                print("\n [Success] The results were written to: ", workbook_path)
+            except (OSError, ValueError) as error:
+                print("\n [Error] Could not write the workbook: ", error)
+
+        elif command == "--change_crt":
+            global crt
+            crt = not crt
+            print("\n [Success] Signing with the Chinese Remainder Theorem is now: ", crt)
+
+        elif command == "--compare_crt":
+            text = input("\n@User: Data to be signed: \n")
+            compare_crt(text)
+
+        elif command == "--change_engine":
+            global processes
+            processes = not processes
+            if processes:
+                print("\n [Success] Averages are now found using worker processes")
+            else:
+                print("\n [Success] Averages are now found using threads")
+
+        elif command == "--change_workers":
+            global workers
+            workers = number_checker_workers()
+            print("\n [Success] The number of worker processes was changed to: ", workers)
+
+        elif command == "--sign_file":
+            path = input("\n@User: Path of the file to sign: \n")
+            try:
+                key_pair = generate(False)
+                print("\n [Success] The signature was written to: ", sign_file(path, key_pair))
+                with open(path + '.pub.pem', 'wb') as file:
+                    file.write(RSA.construct((key_pair.n, key_pair.e)).export_key(format='PEM'))
+                print(" [Public key] written to: ", path + '.pub.pem', " Give it to whoever verifies the file")
+            except OSError as error:
+                print("\n [Error] Could not sign the file: ", error)
+
+        elif command == "--verify_file":
+            path = input("\n@User: Path of the file to verify: \n")
+            key_path = input("\n@User: Path of the trusted public key of the signer (PEM): \n")
+            try:
+                with open(key_path, 'rb') as file:
+                    trusted_key = RSA.import_key(file.read())
+                if verify_file(path, trusted_key):
+                    print("\n [Signature validity]: [Valid]")
+                else:
+                    print("\n [Signature validity]: [Invalid]")
+            except (OSError, KeyError, ValueError) as error:
+                print("\n [Error] Could not verify the file: ", error)
+
+        elif command == "--change_reuse_key":
+            global reuse_key
+            reuse_key = not reuse_key
+            print("\n [Success] Reusing a saved key pair is now: ", reuse_key)
+
+        elif command == "--change_primes":
+            new_primes = input("\n@User: Number of primes (2, 3 or 4): \n")
+            if new_primes in ('2', '3', '4'):
+                global primes
+                primes = int(new_primes)
+                print("\n [Success] The number of primes was changed to: ", primes)
+                if usable_primes(bit_size, primes) < primes:
+                    print(" [Note] Fewer primes are used until the bit size is at least",
+                          multi_prime_min_bit_sizes[primes])
             else:
-                is_writing_to_workbook(runs, text, threads, False)
+                print("\n [Error] Incorrect type. Try 2, 3 or 4.")
+
+        elif command == "--change_digest":
+            new_digest = input("\n@User: Digest (" + ", ".join(digests) + "): \n")
+            if new_digest in digests:
+                global digest
+                digest = new_digest
+                print("\n [Success] The digest was changed to: ", digest)
+            else:
+                print("\n [Error] Incorrect type. Try one of " + ", ".join(digests) + ".")
+
+        elif command == "--change_parallel_keygen":
+            global parallel_keygen
+            parallel_keygen = not parallel_keygen
+            print("\n [Success] Searching for p and q on worker processes is now: ", parallel_keygen)
 
         elif command == "--exit":
             print("\n [Exiting]")
@@ -527,4 +2013,6 @@ def print_title():
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(headless(sys.argv[1:]))
     commands()
@@ -0,0 +1,442 @@
+"""
+    Runs the sweep of --multiple_averages on any number of hosts at once
+        - A coordinator splits the trials of every bit size into work units and hands them out over HTTP
+        - Workers run the units with digital_signatures.py and send back the times of every trial as soon as it
+          finishes, tagged with the host it ran on
+        - A unit whose worker has sent nothing for --lease seconds is handed to another worker
+        - Every finished bit size is added to the same Averages_1.csv as --multiple_averages, so either one can
+          resume a sweep the other started
+
+    Coordinator:
+        python3 distributed.py coordinator --runs 8 --trials 40
+    Workers, on every host that can reach the coordinator:
+        python3 distributed.py worker --url http://<coordinator>:8765 --processes 4
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import digital_signatures
+
+# Columns of the file that every trial a coordinator accepts is written to
+measurement_fields = ('bit_size', 'unit', 'worker', 'host', 'platform', 'cores', 'python', 'arithmetic', 'total',
+                      'keygen', 'sign', 'verify', 'timestamp')
+# Seconds a worker waits before asking again when every unit that is left is being run by another worker
+wait_time = 2
+
+
+def host_info():
+    """
+        Method describes the host a worker runs on, so the times from different hosts can be told apart
+
+        @return:
+            host : dictionary of the host name, platform, cores, Python version and arithmetic backend
+    """
+    return {'host': platform.node(), 'platform': platform.platform(), 'cores': os.cpu_count(),
+            'python': platform.python_version(), 'arithmetic': digital_signatures.arithmetic_backend}
+
+
+class WorkUnit:
+    """
+        A number of trials of one bit size that is run by one worker at a time
+            - lease counts how many times the unit was handed out, times sent for an older lease are refused
+    """
+
+    def __init__(self, unit_id, bit_size, count):
+        self.id = unit_id
+        self.bit_size = bit_size
+        self.count = count
+        self.lease = 0
+        self.worker = None
+        self.deadline = None
+        self.done = False
+        self.statistics = None
+        self.rows = []
+
+
+class Coordinator:
+    """
+        Keeps the work units of a sweep and merges the times sent for them
+            - The times of a unit are only added to its bit size once all of them arrived, so a unit that is handed
+              to another worker part way through is not counted twice
+            - A bit size is written to the results file as soon as all of its units are done
+
+        @param:
+            bit_sizes : the bit sizes to sweep
+            trials : the number of trials of every bit size
+            batch : the number of trials in a work unit
+            settings : dictionary of the text, crt, primes and digest the trials are run with
+            sink : the ResultsSink that finished bit sizes are written to
+            measurements_path : csv file every accepted trial is appended to, None to not write them
+            lease : the seconds a worker has to send the next time of a unit before it is handed to another worker
+            resume : boolean whether the trials are appended to measurements_path instead of starting it over
+    """
+
+    def __init__(self, bit_sizes, trials, batch, settings, sink, measurements_path=None, lease=600, resume=True):
+        self.settings = settings
+        self.sink = sink
+        self.lease = lease
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.units = []
+        self.remaining = {}
+        self.statistics = {}
+        self.hosts = {}
+        self.results = []
+        for bit_size in bit_sizes:
+            counts = [min(batch, trials - n) for n in range(0, trials, batch)]
+            self.remaining[bit_size] = len(counts)
+            self.statistics[bit_size] = digital_signatures.TrialStatistics()
+            self.hosts[bit_size] = {}
+            for count in counts:
+                self.units.append(WorkUnit(len(self.units), bit_size, count))
+        if not self.units:
+            self.finished.set()
+
+        self.measurements = None
+        if measurements_path:
+            is_new = not resume or not os.path.exists(measurements_path)
+            self.measurements = open(measurements_path, 'w' if is_new else 'a', newline='')
+            self.measurements_writer = csv.writer(self.measurements)
+            if is_new:
+                self.measurements_writer.writerow(measurement_fields)
+
+    def assign(self, worker):
+        """
+            Method hands out the next unit that nobody is running, or one whose worker stopped sending times
+
+            @param:
+                worker : the name of the worker asking
+
+            @return:
+                work : dictionary of the unit and the settings to run it with, {'wait': seconds} if every unit left
+                       is being run, or {'done': True} once the sweep is finished
+        """
+        with self.lock:
+            now = time.monotonic()
+            running = False
+            for unit in self.units:
+                if unit.done:
+                    continue
+                if unit.worker is not None and unit.deadline > now:
+                    running = True
+                    continue
+                if unit.worker is not None:
+                    print("[Reassigning] unit", unit.id, "of", unit.worker, "to", worker, flush=True)
+                unit.lease += 1
+                unit.worker = worker
+                unit.deadline = now + self.lease
+                unit.statistics = digital_signatures.TrialStatistics()
+                unit.rows = []
+                work = {'unit': unit.id, 'lease': unit.lease, 'bit_size': unit.bit_size, 'count': unit.count}
+                work.update(self.settings)
+                return work
+            return {'wait': wait_time} if running else {'done': True}
+
+    def record(self, message):
+        """
+            Method adds the times of one trial sent by a worker
+
+            @param:
+                message : dictionary of the unit, lease, worker, host and the times of each phase
+
+            @return:
+                Boolean : True if the times were added, False if the unit was handed to another worker since
+        """
+        times = {phase: float(message['times'][phase]) for phase in digital_signatures.TrialStatistics.phases}
+        host = message.get('host') or {}
+        with self.lock:
+            index = int(message['unit'])
+            if index < 0:
+                raise IndexError(index)
+            unit = self.units[index]
+            if unit.done or unit.lease != message['lease'] or unit.worker != message['worker']:
+                return False
+            unit.deadline = time.monotonic() + self.lease
+            for phase, seconds in times.items():
+                unit.statistics.record(phase, seconds)
+            unit.rows.append((unit.bit_size, unit.id, unit.worker, host.get('host'), host.get('platform'),
+                              host.get('cores'), host.get('python'), host.get('arithmetic'), times['total'],
+                              times['keygen'], times['sign'], times['verify'], time.time()))
+            if unit.statistics.histograms['total'].count >= unit.count:
+                self.finish_unit(unit, str(host.get('host')))
+            return True
+
+    def finish_unit(self, unit, host_name):
+        unit.done = True
+        if self.measurements is not None:
+            self.measurements_writer.writerows(unit.rows)
+            self.measurements.flush()
+        statistics = self.statistics[unit.bit_size].merge(unit.statistics)
+        unit.statistics = None
+        unit.rows = []
+        hosts = self.hosts[unit.bit_size]
+        hosts[host_name] = hosts.get(host_name, 0) + unit.count
+        self.remaining[unit.bit_size] -= 1
+        if self.remaining[unit.bit_size]:
+            return
+
+        runs = statistics.histograms['total'].count
+        self.sink.append(unit.bit_size, statistics.mean(), runs)
+        self.results.append((statistics.mean(), unit.bit_size, statistics))
+        print("\n[Finished] :", unit.bit_size, " [Average time] : ", statistics.mean(), " [Runs] : ", runs,
+              " [Hosts] : ", ", ".join(name + " (" + str(count) + ")" for name, count in sorted(hosts.items())),
+              flush=True)
+        digital_signatures.print_statistics(statistics)
+        if not any(self.remaining.values()):
+            self.finished.set()
+
+    def close(self):
+        if self.measurements is not None:
+            self.measurements.close()
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """
+        Answers the two requests of a worker with JSON
+            - POST /work : {'worker': name} -> the next unit to run
+            - POST /measurement : the times of one trial of a unit -> 409 if the unit was handed to another worker
+    """
+
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            message = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/work':
+                status, response = 200, coordinator.assign(str(message['worker']))
+            elif self.path == '/measurement':
+                if coordinator.record(message):
+                    status, response = 200, {'accepted': True}
+                else:
+                    status, response = 409, {'error': "[Error] The unit was handed to another worker."}
+            else:
+                status, response = 404, {'error': "[Error] Unknown path: " + self.path}
+        except (ValueError, KeyError, TypeError, IndexError):
+            status, response = 400, {'error': "[Error] Badly formed message."}
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TrialTimes:
+    """
+        Keeps the time of each phase of one trial, it is passed to timed_trial in place of a TrialStatistics
+    """
+
+    def __init__(self):
+        self.times = {}
+
+    def record(self, phase, seconds):
+        self.times[phase] = seconds
+
+
+def post(url, path, message, timeout=60):
+    """
+        Method sends a JSON message to the coordinator
+
+        @param:
+            url : the address of the coordinator, http://127.0.0.1:8765
+            path : /work or /measurement
+            message : the dictionary to send
+
+        @return:
+            status : the HTTP status
+            response : the dictionary that was answered
+    """
+    request = Request(url.rstrip('/') + path, json.dumps(message).encode('utf-8'),
+                      {'Content-Type': 'application/json'})
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as error:
+        with error:
+            return error.code, json.loads(error.read() or b'{}')
+
+
+def run_worker(url, retries=5):
+    """
+        Method asks the coordinator for units and runs them until the sweep is finished
+            - The times of every trial are sent as soon as it finishes, which also tells the coordinator the worker
+              is still running the unit
+            - Stops once the coordinator could not be reached retries times in a row
+
+        @param:
+            url : the address of the coordinator
+            retries : the number of failed attempts in a row before giving up
+
+        @return:
+            trials : the number of trials whose times were accepted
+    """
+    worker = platform.node() + "-" + str(os.getpid())
+    host = host_info()
+    failures = 0
+    trials = 0
+    while True:
+        try:
+            status, work = post(url, '/work', {'worker': worker})
+            if status != 200:
+                raise OSError(work.get('error', "[Error] The coordinator answered " + str(status)))
+            failures = 0
+            if work.get('done'):
+                break
+            if 'wait' in work:
+                time.sleep(work['wait'])
+                continue
+            for n in range(work['count']):
+                times = TrialTimes()
+                digital_signatures.timed_trial(work['text'], work['text'], work['bit_size'], work['crt'],
+                                               work['primes'], work['digest'], times)
+                status, response = post(url, '/measurement', {'unit': work['unit'], 'lease': work['lease'],
+                                                              'worker': worker, 'host': host, 'times': times.times})
+                if status != 200:
+                    # The unit was handed to another worker, the rest of it is not needed from this one
+                    break
+                trials += 1
+        except OSError as error:
+            failures += 1
+            if failures > retries:
+                print("[Worker " + worker + "] Stopping, the coordinator can not be reached:", error, file=sys.stderr,
+                      flush=True)
+                break
+            time.sleep(min(30, 2 ** failures))
+    print("[Worker " + worker + "] Done after", trials, "trials", flush=True)
+    return trials
+
+
+def run_coordinator(arguments):
+    """
+        Method runs the coordinator until every bit size is finished, then writes the workbook
+
+        @param:
+            arguments : the parsed command line arguments
+
+        @return:
+            status : 0 once the sweep is finished, 1 if it was stopped first
+    """
+    bit_sizes = arguments.bit_sizes or [1024 * (n + 1) for n in range(arguments.runs)]
+    # The hosts, their worker processes and arithmetic backends are written per trial to the measurements file,
+    # workers never search for p and q at the same time
+    sink = digital_signatures.ResultsSink(arguments.results, digital_signatures.sweep_settings(
+        arguments.text, arguments.trials, arguments.primes, not arguments.no_crt, arguments.digest, 'distributed',
+        None, False, None), resume=not arguments.no_resume)
+    completed = sink.completed()
+    for bit_size in bit_sizes:
+        if bit_size in completed:
+            print("[Skipping] :", bit_size, " [Average time] : ", completed[bit_size])
+    settings = {'text': arguments.text, 'crt': not arguments.no_crt, 'primes': arguments.primes,
+                'digest': arguments.digest}
+    coordinator = Coordinator([size for size in bit_sizes if size not in completed], arguments.trials,
+                              arguments.batch, settings, sink, arguments.measurements or None, arguments.lease,
+                              sink.resumed)
+
+    httpd = ThreadingHTTPServer((arguments.host, arguments.port), CoordinatorHandler)
+    httpd.daemon_threads = True
+    httpd.coordinator = coordinator
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    print("Coordinating on http://" + arguments.host + ":" + str(httpd.server_address[1]) + "/ with",
+          len(coordinator.units), "units of", arguments.batch, "trials", flush=True)
+    try:
+        while not coordinator.finished.wait(1):
+            pass
+        # Workers that are waiting for a unit ask again within wait_time and are told the sweep is finished
+        time.sleep(arguments.linger)
+    except KeyboardInterrupt:
+        print("\n[Stopped] The finished bit sizes are in:", arguments.results)
+    finally:
+        httpd.shutdown()
+        thread.join()
+        httpd.server_close()
+        with coordinator.lock:
+            coordinator.close()
+            sink.close()
+
+    if not coordinator.finished.is_set():
+        return 1
+    if coordinator.results:
+        digital_signatures.print_summary(sorted(coordinator.results, key=lambda result: result[1]))
+    if arguments.workbook:
+        try:
+            digital_signatures.export_workbook(arguments.results, arguments.workbook)
+        except ValueError as error:
+            print("\n", error, " The results are in: ", arguments.results)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the sweep of --multiple_averages on many hosts: a coordinator "
+                                                 "hands out the trials and workers run them.")
+    commands_parser = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = commands_parser.add_parser('coordinator', help="hand out the trials and merge the results")
+    coordinator_parser.add_argument('--host', default='0.0.0.0', help="address to listen on")
+    coordinator_parser.add_argument('--port', type=int, default=8765)
+    coordinator_parser.add_argument('--runs', type=int, default=4, help="sweep the bit sizes 1024, 2048, ... up to "
+                                                                        "runs * 1024")
+    coordinator_parser.add_argument('--bit_sizes', type=int, nargs='+', help="bit sizes to sweep instead of --runs")
+    coordinator_parser.add_argument('--trials', type=int, default=20, help="trials of every bit size")
+    coordinator_parser.add_argument('--batch', type=int, default=5, help="trials in a work unit")
+    coordinator_parser.add_argument('--text', default="Distributed sweep", help="the data that is signed")
+    coordinator_parser.add_argument('--no_crt', action='store_true', help="sign without the Chinese Remainder Theorem")
+    coordinator_parser.add_argument('--primes', type=int, choices=(2, 3, 4), default=2,
+                                    help="primes in the modulus of bit sizes of 4096 and up")
+    coordinator_parser.add_argument('--digest', choices=list(digital_signatures.digests),
+                                    default=digital_signatures.digest)
+    coordinator_parser.add_argument('--lease', type=float, default=600,
+                                    help="seconds without a time from a worker before its unit is handed to another")
+    coordinator_parser.add_argument('--linger', type=float, default=wait_time + 1,
+                                    help="seconds to keep answering after the sweep so waiting workers stop")
+    coordinator_parser.add_argument('--results', default='Averages_1.csv', help="csv file of the averages")
+    coordinator_parser.add_argument('--measurements', default='Averages_1_trials.csv',
+                                    help="csv file of every trial with its host, empty to not write it")
+    coordinator_parser.add_argument('--workbook', default='Averages_1.xls', help="workbook written at the end, "
+                                                                                 "empty to not write it")
+    coordinator_parser.add_argument('--no_resume', action='store_true',
+                                    help="start the results over instead of skipping the finished bit sizes")
+
+    worker_parser = commands_parser.add_parser('worker', help="run trials handed out by a coordinator")
+    worker_parser.add_argument('--url', default='http://127.0.0.1:8765', help="address of the coordinator")
+    worker_parser.add_argument('--processes', type=int, default=1, help="worker processes to run on this host")
+    worker_parser.add_argument('--retries', type=int, default=5,
+                               help="failed attempts in a row to reach the coordinator before stopping")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == 'worker':
+        if arguments.processes < 1:
+            parser.error("[Error] --processes must be at least 1")
+        if arguments.processes == 1:
+            run_worker(arguments.url, arguments.retries)
+            return 0
+        processes = [Process(target=run_worker, args=(arguments.url, arguments.retries))
+                     for n in range(arguments.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return 0
+
+    for bit_size in arguments.bit_sizes or []:
+        if not digital_signatures.bit_size_checking(bit_size):
+            parser.error("[Error] Incorrect type. Try an integer that is a multiple of 1024.")
+    if arguments.trials < 1 or arguments.batch < 1 or arguments.runs < 1:
+        parser.error("[Error] --runs, --trials and --batch must be at least 1")
+    return run_coordinator(arguments)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import os
+
+# gmpy2 is optional; it does modular exponentiation with GMP, which is much faster than pow() at 4096+ bits
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+backends = ('gmpy2', 'python')
+
+
+def python_powmod(base, exponent, modulus):
+    return pow(base, exponent, modulus)
+
+
+def gmpy2_powmod(base, exponent, modulus):
+    return int(gmpy2.powmod(base, exponent, modulus))
+
+
+def select(name='auto'):
+    """
+        Method selects the backend that modular exponentiation is done with
+
+        @param:
+            name : 'gmpy2', 'python' or 'auto' to use gmpy2 when it is installed and pow() otherwise
+
+        @return:
+            backend : the name of the backend that is now active
+    """
+    global backend, powmod
+    if name == 'auto':
+        name = 'gmpy2' if gmpy2 is not None else 'python'
+    if name == 'gmpy2':
+        if gmpy2 is None:
+            raise ValueError("[Error] The gmpy2 backend was asked for but gmpy2 is not installed.")
+        powmod = gmpy2_powmod
+    elif name == 'python':
+        powmod = python_powmod
+    else:
+        raise ValueError("[Error] Unknown arithmetic backend: " + str(name))
+    backend = name
+    return backend
+
+
+backend = None
+powmod = python_powmod
+select(os.environ.get('SIGNATURES_ARITHMETIC', 'auto'))
@@ -0,0 +1,300 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from hashlib import sha512
+import signatures
+import arithmetic
+
+# Two sided 95% t values for 1 to 30 degrees of freedom, 1.96 is used above that
+t_values = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+            2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+            2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def percentile(sorted_samples, fraction):
+    """
+        Method gets a percentile of samples by interpolating between the two closest ones
+
+        @param:
+            sorted_samples : the samples, sorted
+            fraction : the percentile as a fraction, 0.95 for p95
+
+        @return:
+            value : the percentile
+    """
+    position = (len(sorted_samples) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def summarize(samples):
+    """
+        Method gets the statistics of the samples of one phase
+
+        @param:
+            samples : the times in nanoseconds
+
+        @return:
+            summary : dictionary of the count, mean, median, p95, p99, min, max, standard deviation
+                      and the 95% confidence interval of the mean, all in nanoseconds
+    """
+    sorted_samples = sorted(samples)
+    count = len(sorted_samples)
+    mean = statistics.fmean(sorted_samples)
+    stdev = statistics.stdev(sorted_samples) if count > 1 else 0.0
+    t_value = t_values[count - 2] if 1 < count <= len(t_values) + 1 else 1.96
+    half_width = t_value * stdev / math.sqrt(count)
+    return {
+        'count': count,
+        'mean': mean,
+        'median': percentile(sorted_samples, 0.5),
+        'p95': percentile(sorted_samples, 0.95),
+        'p99': percentile(sorted_samples, 0.99),
+        'min': sorted_samples[0],
+        'max': sorted_samples[-1],
+        'stdev': stdev,
+        'ci95_low': mean - half_width,
+        'ci95_high': mean + half_width,
+    }
+
+
+def time_phase(function, repetitions, warmup):
+    """
+        Method times a phase on its own, after running it a few times untimed to warm up
+
+        @param:
+            function : the phase, called without arguments
+            repetitions : the number of timed runs
+            warmup : the number of untimed runs before them
+
+        @return:
+            samples : the time of each run in nanoseconds
+    """
+    for n in range(warmup):
+        function()
+    samples = []
+    for n in range(repetitions):
+        start = time.perf_counter_ns()
+        function()
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+def host_info():
+    """
+        Method gets what the benchmark was run on, so result files from different hosts are not mixed up
+
+        @return:
+            info : dictionary of the host name, platform, python version, number of cores and arithmetic backend
+    """
+    return {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cores': os.cpu_count(),
+        'arithmetic': arithmetic.backend,
+    }
+
+
+def run(bit_sizes, repetitions, keygen_repetitions, warmup, data_size, generators=('pycryptodome',)):
+    """
+        Method times key generation, hashing, signing and verifying separately for every bit size
+            - Key generation is timed on its own since its random cost would otherwise swamp the other phases
+            - Signing and verifying use the last generated key so only the exponentiation is timed
+
+        @param:
+            bit_sizes : the bit sizes to benchmark
+            repetitions : the number of timed runs of hashing, signing and verifying
+            keygen_repetitions : the number of timed key generations
+            warmup : the number of untimed runs before each phase
+            data_size : the number of bytes of data that are signed
+            generators : the key generators to time. The first is reported as 'keygen', the others as
+                         'keygen_<generator>' so they can be compared head to head
+
+        @return:
+            results : dictionary of the host, configuration and per bit size summary of every phase
+    """
+    data = b'\x00' * data_size
+    results = {
+        'host': host_info(),
+        'config': {'repetitions': repetitions, 'keygen_repetitions': keygen_repetitions, 'warmup': warmup,
+                   'data_size': data_size, 'generators': list(generators)},
+        'results': {},
+    }
+    for bit_size in bit_sizes:
+        key_pairs = []
+        phases = {}
+        for generator in generators:
+            phase = 'keygen' if generator == generators[0] else 'keygen_' + generator
+            phases[phase] = summarize(time_phase(
+                lambda: key_pairs.append(signatures.generate(bit_size, generator=generator)), keygen_repetitions, 0))
+        key_pair = key_pairs[-1]
+
+        hashed = int.from_bytes(sha512(data).digest(), byteorder='big')
+        # The key context and numbers are made once here so only the exponentiations are timed
+        context = signatures.key_context(key_pair)
+        e, n, d = context.e, context.n, int(key_pair.d)
+        signature = signatures.crt_signing(hashed, context)
+        powmod = arithmetic.powmod
+        phases['hash'] = summarize(time_phase(lambda: sha512(data).digest(), repetitions, warmup))
+        phases['sign'] = summarize(time_phase(lambda: signatures.crt_signing(hashed, context), repetitions, warmup))
+        phases['sign_without_crt'] = summarize(time_phase(lambda: powmod(hashed, d, n), repetitions, warmup))
+        phases['verify'] = summarize(time_phase(lambda: powmod(signature, e, n) == hashed, repetitions, warmup))
+        results['results'][str(bit_size)] = phases
+    return results
+
+
+def run_digests(digests, sizes, repetitions, warmup):
+    """
+        Method times hashing data of different sizes with every digest, to find the fastest one for a payload size
+
+        @param:
+            digests : the names of the digests to time, from signatures.digests
+            sizes : the sizes of the data in bytes
+            repetitions : the number of timed runs of each digest and size
+            warmup : the number of untimed runs before each
+
+        @return:
+            results : dictionary of the host, configuration and per size summary of every digest, with the median
+                      throughput added as 'mb_per_s'
+    """
+    results = {
+        'host': host_info(),
+        'config': {'repetitions': repetitions, 'warmup': warmup, 'sizes': list(sizes), 'digests': list(digests)},
+        'results': {},
+    }
+    for size in sizes:
+        data = b'\x00' * size
+        phases = {}
+        for digest in digests:
+            constructor = signatures.digests[digest]
+            summary = summarize(time_phase(lambda: constructor(data).digest(), repetitions, warmup))
+            summary['mb_per_s'] = size / summary['median'] * 1e3 if summary['median'] else float('inf')
+            phases[digest] = summary
+        results['results'][str(size)] = phases
+    return results
+
+
+def compare(baseline, current, threshold):
+    """
+        Method compares two result files phase by phase
+            - A phase regressed if its median got slower by more than the threshold and the confidence
+              intervals of the two runs do not overlap, so noise alone is not reported
+
+        @param:
+            baseline : the results that are compared against
+            current : the new results
+            threshold : the fraction the median may grow by, 0.05 for 5%
+
+        @return:
+            rows : list of (bit_size, phase, baseline median, current median, ratio, regressed)
+    """
+    rows = []
+    for bit_size, phases in current['results'].items():
+        for phase, summary in phases.items():
+            old = baseline['results'].get(bit_size, {}).get(phase)
+            if old is None:
+                continue
+            ratio = summary['median'] / old['median'] if old['median'] else float('inf')
+            regressed = ratio > 1 + threshold and summary['ci95_low'] > old['ci95_high']
+            rows.append((bit_size, phase, old['median'], summary['median'], ratio, regressed))
+    return rows
+
+
+def print_results(results):
+    print(" [Arithmetic backend]:", results['host'].get('arithmetic'))
+    for bit_size, phases in results['results'].items():
+        print("\n [Bit size]:", bit_size)
+        for phase, summary in phases.items():
+            print("  [%s] median: %.3f ms  p95: %.3f ms  p99: %.3f ms  95%% CI: %.3f - %.3f ms  runs: %d" % (
+                phase, summary['median'] / 1e6, summary['p95'] / 1e6, summary['p99'] / 1e6,
+                summary['ci95_low'] / 1e6, summary['ci95_high'] / 1e6, summary['count']))
+
+
+def print_digest_results(results):
+    for size, phases in results['results'].items():
+        print("\n [Data size]:", size, "bytes")
+        for digest, summary in sorted(phases.items(), key=lambda item: -item[1]['mb_per_s']):
+            print("  [%s] %.1f MB/s  median: %.3f ms  p95: %.3f ms" % (
+                digest, summary['mb_per_s'], summary['median'] / 1e6, summary['p95'] / 1e6))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks key generation, hashing, signing and verifying.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="time every phase for some bit sizes")
+    run_parser.add_argument('--bit-sizes', type=int, nargs='+', default=[1024, 2048, 3072, 4096])
+    run_parser.add_argument('--repetitions', type=int, default=50)
+    run_parser.add_argument('--keygen-repetitions', type=int, default=5)
+    run_parser.add_argument('--warmup', type=int, default=5)
+    run_parser.add_argument('--data-size', type=int, default=1024, help="bytes of data that are signed")
+    run_parser.add_argument('--output', help="write the results to this JSON file")
+    run_parser.add_argument('--generators', nargs='+', choices=signatures.generators, default=['pycryptodome'],
+                            help="key generators to time head to head, the first is reported as keygen")
+    run_parser.add_argument('--arithmetic', choices=('auto',) + arithmetic.backends, default=None,
+                            help="backend for modular exponentiation, defaults to SIGNATURES_ARITHMETIC or auto")
+
+    digests_parser = commands.add_parser('digests', help="time the throughput of every digest for some data sizes")
+    digests_parser.add_argument('--digests', nargs='+', choices=list(signatures.digests),
+                                default=list(signatures.digests))
+    digests_parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 65536, 1048576, 16777216],
+                                help="data sizes in bytes")
+    digests_parser.add_argument('--repetitions', type=int, default=20)
+    digests_parser.add_argument('--warmup', type=int, default=2)
+    digests_parser.add_argument('--output', help="write the results to this JSON file")
+
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.05)
+
+    arguments = parser.parse_args(arguments)
+    if arguments.command == 'run':
+        if arguments.arithmetic:
+            try:
+                arithmetic.select(arguments.arithmetic)
+            except ValueError as error:
+                parser.error(str(error))
+        if arguments.repetitions < 1 or arguments.keygen_repetitions < 1:
+            parser.error("repetitions must be at least 1")
+        for bit_size in arguments.bit_sizes:
+            if not signatures.bit_size_checking(bit_size):
+                parser.error("[Error] Incorrect type. Try an integer that is a multiple of 1024.")
+        results = run(arguments.bit_sizes, arguments.repetitions, arguments.keygen_repetitions, arguments.warmup,
+                      arguments.data_size, arguments.generators)
+        print_results(results)
+        if arguments.output:
+            with open(arguments.output, 'w') as file:
+                json.dump(results, file, indent=2)
+        return 0
+
+    if arguments.command == 'digests':
+        if arguments.repetitions < 1 or min(arguments.sizes) < 1:
+            parser.error("repetitions and sizes must be at least 1")
+        results = run_digests(arguments.digests, arguments.sizes, arguments.repetitions, arguments.warmup)
+        print_digest_results(results)
+        if arguments.output:
+            with open(arguments.output, 'w') as file:
+                json.dump(results, file, indent=2)
+        return 0
+
+    with open(arguments.baseline) as file:
+        baseline = json.load(file)
+    with open(arguments.current) as file:
+        current = json.load(file)
+    rows = compare(baseline, current, arguments.threshold)
+    for bit_size, phase, old_median, new_median, ratio, regressed in rows:
+        print(" [%s %s] %.3f ms -> %.3f ms (x%.2f)%s" % (bit_size, phase, old_median / 1e6, new_median / 1e6, ratio,
+                                                        "  [Regression]" if regressed else ""))
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
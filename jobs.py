@@ -0,0 +1,143 @@
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Lock
+
+
+class JobQueueFull(Exception):
+    """
+        Raised when a job is submitted while the runner already has as many jobs waiting as it allows
+    """
+
+
+class Job:
+    """
+        A request that is worked on in the background. The work reports its progress through update().
+
+        @param:
+            job_id : the id the job is looked up by
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.version = 0
+        self._changed = Condition()
+
+    def update(self, progress=None, message=None, status=None, result=None, error=None):
+        """
+            Method updates the job and wakes up anyone waiting for it to change
+
+            @param:
+                progress : fraction of the work that is done, from 0 to 1
+                message : what is being worked on
+                status : 'queued', 'running', 'finished' or 'failed'
+                result : the result of the work
+                error : why the work failed
+        """
+        with self._changed:
+            if progress is not None:
+                self.progress = progress
+            if message is not None:
+                self.message = message
+            if status is not None:
+                self.status = status
+            if result is not None:
+                self.result = result
+            if error is not None:
+                self.error = error
+            self.version += 1
+            self._changed.notify_all()
+
+    def is_done(self):
+        return self.status in ('finished', 'failed')
+
+    def wait(self, version, timeout):
+        """
+            Method waits until the job changes after a version that was already seen
+
+            @param:
+                version : the last version that was seen
+                timeout : the most seconds to wait
+
+            @return:
+                version : the current version, the same one if nothing changed before the timeout
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self.is_done(), timeout)
+            return self.version
+
+    def to_dict(self):
+        with self._changed:
+            return {'job_id': self.job_id, 'status': self.status, 'progress': self.progress,
+                    'message': self.message, 'result': self.result, 'error': self.error}
+
+
+class JobRunner:
+    """
+        Runs jobs on a bounded number of threads so expensive requests do not hold on to a server worker.
+
+        @param:
+            max_workers : the number of jobs that run at the same time
+            max_pending : the number of jobs that can be queued or running before submit() raises JobQueueFull
+            max_finished : the number of finished jobs that are remembered for lookups
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, max_finished=256):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = Lock()
+        self._executor = None
+
+    def submit(self, function, *args):
+        """
+            Method queues some work
+
+            @param:
+                function : the work, called as function(job, *args) and returning the result
+                args : the arguments of the work
+
+            @return:
+                job : the job the work is tracked by
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull("[Error] Too many jobs are waiting. Try again later.")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.job_id] = job
+            self._pending += 1
+            self._forget_finished()
+        self._executor.submit(self._run, job, function, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, function, args):
+        job.update(status='running')
+        try:
+            job.update(progress=1.0, status='finished', result=function(job, *args))
+        except Exception as error:
+            job.update(status='failed', error=str(error))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _forget_finished(self):
+        """
+            Helper method: drops the oldest finished jobs once more than max_finished are remembered.
+                - Must be called with the lock held
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_done()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,236 @@
+import time
+from collections import deque
+from threading import Condition, Lock, Thread
+
+
+class KeyPool:
+    """
+        Pool of pre-generated RSA key pairs, kept per bit size and refilled by a background thread.
+
+        Every bit size that is requested gets its own queue of keys:
+            - once the queue drops below the low watermark, the background thread generates keys until it is
+              back at the high watermark
+            - if more than max_sizes different bit sizes are being tracked, the least requested one is evicted
+              so that rarely used sizes (8192, 16384, ...) do not hold on to keys forever
+            - bit sizes above max_bit_size are never tracked or refilled, since generating one key of a huge size
+              would keep the only refill thread from every other size. They are always generated inline
+
+        @param:
+            generator : the method used to generate a key pair for a given bit size, signatures.generate
+            low_watermark : default number of keys below which a refill is started
+            high_watermark : default number of keys a refill stops at
+            max_sizes : the number of bit sizes that can be tracked at the same time
+            watermarks : dictionary of bit_size -> (low_watermark, high_watermark) to override the defaults
+            min_bit_size : the smallest bit size that is tracked, smaller ones raise a ValueError
+            max_bit_size : the largest bit size that is tracked, larger ones are never taken from the pool
+    """
+
+    def __init__(self, generator, low_watermark=1, high_watermark=2, max_sizes=4, watermarks=None, min_bit_size=1024,
+                 max_bit_size=4096):
+        self.generator = generator
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.max_sizes = max_sizes
+        self.min_bit_size = min_bit_size
+        self.max_bit_size = max_bit_size
+        self.watermarks = dict(watermarks or {})
+
+        self._keys = {}
+        self._requests = {}
+        self._refilling = set()
+        self._lock = Lock()
+        self._wakeup = Condition(self._lock)
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.bypasses = 0
+        self.refill_time_total = 0.0
+        self.refill_time_max = 0.0
+
+    def set_watermarks(self, bit_size, low_watermark, high_watermark):
+        """
+            Method changes the low and high watermarks for a single bit size
+
+            @param:
+                bit_size : the bit size whose watermarks are changed
+                low_watermark : number of keys below which a refill is started
+                high_watermark : number of keys a refill stops at
+        """
+        if low_watermark > high_watermark:
+            raise ValueError("low_watermark must not be larger than high_watermark")
+        with self._lock:
+            self.watermarks[bit_size] = (low_watermark, high_watermark)
+            self._wakeup.notify()
+
+    def get(self, bit_size):
+        """
+            Method takes a key pair out of the pool without ever generating one inline
+
+            @param:
+                bit_size : the bit size of the wanted key pair
+
+            @return:
+                key_pair : a pre-generated key pair, None if there was none available or the bit size is too large
+                           to be pooled
+        """
+        with self._lock:
+            if isinstance(bit_size, int) and bit_size > self.max_bit_size:
+                self.bypasses += 1
+                return None
+            self._track(bit_size)
+            self._requests[bit_size] += 1
+            keys = self._keys[bit_size]
+            if keys:
+                key_pair = keys.popleft()
+                self.hits += 1
+            else:
+                key_pair = None
+                self.misses += 1
+            self._wakeup.notify()
+        self._start()
+        return key_pair
+
+    def acquire(self, bit_size):
+        """
+            Method takes a key pair out of the pool, generating one inline when the pool is empty
+
+            @param:
+                bit_size : the bit size of the wanted key pair
+
+            @return:
+                key_pair : this contains a public and private key
+        """
+        key_pair = self.get(bit_size)
+        if key_pair is None:
+            key_pair = self.generator(bit_size)
+        return key_pair
+
+    def warm(self, bit_size, count=None):
+        """
+            Method fills the pool for a bit size inline, used before a server starts accepting requests
+
+            @param:
+                bit_size : the bit size to fill
+                count : the number of keys to have ready. Defaults to the high watermark of the bit size
+        """
+        if count is None:
+            count = self._watermarks(bit_size)[1]
+        with self._lock:
+            self._track(bit_size)
+            missing = count - len(self._keys[bit_size])
+        for n in range(missing):
+            self._store(bit_size, self._timed_generate(bit_size))
+        self._start()
+
+    def stats(self):
+        """
+            Method gets the counters of the pool so that it can be sized
+
+            @return:
+                stats : dictionary of hits, misses, evictions, refills, bypasses of bit sizes that are too large,
+                        refill latency and keys ready per bit size
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refills': self.refills,
+                'refill_failures': self.refill_failures,
+                'bypasses': self.bypasses,
+                'refill_time_total': self.refill_time_total,
+                'refill_time_max': self.refill_time_max,
+                'sizes': {bit_size: {'ready': len(keys), 'requests': self._requests[bit_size]}
+                          for bit_size, keys in self._keys.items()},
+            }
+
+    def _watermarks(self, bit_size):
+        return self.watermarks.get(bit_size, (self.low_watermark, self.high_watermark))
+
+    def _track(self, bit_size):
+        """
+            Helper method: starts tracking a bit size, evicting the least requested one if there are too many.
+                - Must be called with the lock held
+                - Bit sizes that can not be generated are refused before they take the place of another one
+        """
+        if bit_size in self._keys:
+            return
+        if not isinstance(bit_size, int) or not self.min_bit_size <= bit_size <= self.max_bit_size:
+            raise ValueError("[Error] Only bit sizes from " + str(self.min_bit_size) + " to " +
+                             str(self.max_bit_size) + " can be pooled.")
+        if len(self._keys) >= self.max_sizes:
+            evicted = min(self._requests, key=self._requests.get)
+            del self._keys[evicted]
+            del self._requests[evicted]
+            self._refilling.discard(evicted)
+            self.evictions += 1
+        self._keys[bit_size] = deque()
+        self._requests[bit_size] = 0
+
+    def _next_refill(self):
+        """
+            Helper method: finds a bit size that needs another key, None if every size is full.
+                - Must be called with the lock held
+        """
+        for bit_size, keys in self._keys.items():
+            low_watermark, high_watermark = self._watermarks(bit_size)
+            if len(keys) < low_watermark:
+                self._refilling.add(bit_size)
+            if bit_size in self._refilling:
+                if len(keys) < high_watermark:
+                    return bit_size
+                self._refilling.discard(bit_size)
+        return None
+
+    def _timed_generate(self, bit_size):
+        start = time.perf_counter()
+        key_pair = self.generator(bit_size)
+        run_time = time.perf_counter() - start
+        with self._lock:
+            self.refills += 1
+            self.refill_time_total += run_time
+            self.refill_time_max = max(self.refill_time_max, run_time)
+        return key_pair
+
+    def _forget(self, bit_size):
+        """
+            Helper method: stops tracking a bit size whose generation failed, so the thread does not retry it forever
+        """
+        with self._lock:
+            self.refill_failures += 1
+            self._keys.pop(bit_size, None)
+            self._requests.pop(bit_size, None)
+            self._refilling.discard(bit_size)
+
+    def _store(self, bit_size, key_pair):
+        with self._lock:
+            if bit_size in self._keys:
+                self._keys[bit_size].append(key_pair)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._refill_loop, name="key-pool-refill", daemon=True)
+                self._thread.start()
+
+    def _refill_loop(self):
+        """
+            Helper method: the background thread, waits until some bit size needs keys and generates them
+                - A failed generation only drops its bit size, the thread keeps refilling the others
+        """
+        while True:
+            with self._lock:
+                bit_size = self._next_refill()
+                while bit_size is None:
+                    self._wakeup.wait()
+                    bit_size = self._next_refill()
+            try:
+                key_pair = self._timed_generate(bit_size)
+            except Exception:
+                self._forget(bit_size)
+                continue
+            self._store(bit_size, key_pair)
@@ -0,0 +1,146 @@
+import os
+from hashlib import sha256
+from threading import Lock
+from Cryptodome.PublicKey import RSA
+
+
+def fingerprint(key_pair):
+    """
+        Method gets a short fingerprint of a public key; the first 16 hex digits of the sha256 of 'n' and 'e'
+
+        @param:
+            key_pair : the key pair, or just the public key
+
+        @return:
+            fingerprint : the fingerprint as a hex string
+    """
+    n_bytes = key_pair.n.to_bytes((key_pair.n.bit_length() + 7) // 8, byteorder='big')
+    e_bytes = key_pair.e.to_bytes((key_pair.e.bit_length() + 7) // 8, byteorder='big')
+    return sha256(n_bytes + b':' + e_bytes).hexdigest()[:16]
+
+
+class KeyStore:
+    """
+        Directory of saved RSA key pairs so they survive restarts instead of being generated again.
+
+        Keys are stored as PEM files in a folder per bit size, named by their fingerprint:
+            <directory>/<bit_size>/<fingerprint>.pem
+
+        Nothing is read until it is needed; the folder of a bit size is listed the first time that size is
+        asked for, and a key file is only read the first time that key is used.
+
+        @param:
+            directory : the folder the keys are stored in
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._fingerprints = {}
+        self._keys = {}
+        self._lock = Lock()
+
+    def path(self, bit_size, key_fingerprint):
+        return os.path.join(self.directory, str(bit_size), key_fingerprint + '.pem')
+
+    def save(self, key_pair):
+        """
+            Method saves a key pair in the store
+
+            @param:
+                key_pair : the key pair to save
+
+            @return:
+                key_fingerprint : the fingerprint the key pair is stored under
+        """
+        bit_size = key_pair.size_in_bits()
+        key_fingerprint = fingerprint(key_pair)
+        path = self.path(bit_size, key_fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temporary_path = path + '.tmp'
+        file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(key_pair.export_key(format='PEM'))
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            fingerprints = self._fingerprints.get(bit_size)
+            if fingerprints is not None and key_fingerprint not in fingerprints:
+                fingerprints.append(key_fingerprint)
+            self._keys[key_fingerprint] = key_pair
+        return key_fingerprint
+
+    def fingerprints(self, bit_size):
+        """
+            Method lists the fingerprints of the stored key pairs of a bit size
+
+            @param:
+                bit_size : the bit size of the key pairs
+
+            @return:
+                fingerprints : list of fingerprints, oldest first
+        """
+        with self._lock:
+            fingerprints = self._fingerprints.get(bit_size)
+            if fingerprints is None:
+                folder = os.path.join(self.directory, str(bit_size))
+                try:
+                    names = [name for name in os.listdir(folder) if name.endswith('.pem')]
+                except FileNotFoundError:
+                    names = []
+                names.sort(key=lambda name: os.path.getmtime(os.path.join(folder, name)))
+                fingerprints = [name[:-len('.pem')] for name in names]
+                self._fingerprints[bit_size] = fingerprints
+            return list(fingerprints)
+
+    def load(self, bit_size, key_fingerprint):
+        """
+            Method loads a stored key pair, reading its file only the first time
+
+            @param:
+                bit_size : the bit size of the key pair
+                key_fingerprint : the fingerprint of the key pair
+
+            @return:
+                key_pair : this contains a public and private key
+        """
+        with self._lock:
+            key_pair = self._keys.get(key_fingerprint)
+        if key_pair is None:
+            with open(self.path(bit_size, key_fingerprint), 'rb') as file:
+                key_pair = RSA.import_key(file.read())
+            with self._lock:
+                self._keys[key_fingerprint] = key_pair
+        return key_pair
+
+    def get(self, bit_size):
+        """
+            Method gets a stored key pair of a bit size
+
+            @param:
+                bit_size : the bit size of the key pair
+
+            @return:
+                key_pair : the oldest stored key pair of that size, None if there is none
+        """
+        fingerprints = self.fingerprints(bit_size)
+        if not fingerprints:
+            return None
+        return self.load(bit_size, fingerprints[0])
+
+    def get_or_generate(self, bit_size, generator):
+        """
+            Method gets a stored key pair of a bit size, generating and saving one if there is none
+
+            @param:
+                bit_size : the bit size of the key pair
+                generator : the method used to generate a key pair, signatures.generate
+
+            @return:
+                key_pair : this contains a public and private key
+        """
+        key_pair = self.get(bit_size)
+        if key_pair is None:
+            key_pair = generator(bit_size)
+            self.save(key_pair)
+        return key_pair
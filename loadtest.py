@@ -0,0 +1,324 @@
+import argparse
+import http.client
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+import benchmark
+import signatures
+
+# Routes that can be driven, weighted with route:weight on the command line
+routes = ('process', 'time_process', 'sign_batch', 'verify_batch')
+
+
+class HttpClient:
+    """
+        Sends requests to a running server over one kept alive connection. One is made per thread.
+
+        @param:
+            url : the address of the server, http://127.0.0.1:5000
+            timeout : the seconds to wait for a response
+    """
+
+    def __init__(self, url, timeout=60):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.connection = None
+
+    def post(self, path, form=None, json_body=None):
+        """
+            Method sends a POST request
+
+            @param:
+                path : the route, /process
+                form : dictionary of the form fields, or None
+                json_body : the JSON body, or None
+
+            @return:
+                status : the HTTP status
+                body : the body of the response as bytes
+        """
+        if json_body is not None:
+            body, content_type = json.dumps(json_body), 'application/json'
+        else:
+            body, content_type = urlencode(form), 'application/x-www-form-urlencoded'
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.connection.request('POST', self.prefix + path, body, {'Content-Type': content_type})
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            # The connection can not be used again after a failure
+            self.connection.close()
+            self.connection = None
+            raise
+
+
+class InProcessClient:
+    """
+        Sends requests straight to the Flask application through its test client, so no server has to be started.
+        One is made per thread.
+    """
+
+    def __init__(self):
+        # Only imported here so that testing a running server does not load the application
+        import server
+        self.client = server.app.test_client()
+
+    def post(self, path, form=None, json_body=None):
+        if json_body is not None:
+            response = self.client.post(path, json=json_body)
+        else:
+            response = self.client.post(path, data=form)
+        return response.status_code, response.get_data()
+
+
+def parse_mix(values, allowed=None):
+    """
+        Method reads a weighted mix such as ['1024:3', '2048'] where the weight defaults to 1
+
+        @param:
+            values : list of 'value' or 'value:weight'
+            allowed : the values that are allowed, None to allow bit sizes
+
+        @return:
+            mix : list of (value, weight)
+    """
+    mix = []
+    for value in values:
+        name, separator, weight = value.partition(':')
+        weight = float(weight) if separator else 1.0
+        if allowed is not None and name not in allowed:
+            raise ValueError("[Error] Unknown route: " + name + ". Try one of " + ", ".join(allowed) + ".")
+        if allowed is None and not signatures.bit_size_checking(name):
+            raise ValueError("[Error] Incorrect type. Try an integer that is a multiple of 1024.")
+        if weight <= 0:
+            raise ValueError("[Error] Weights must be larger than 0.")
+        mix.append((name if allowed is not None else int(name), weight))
+    return mix
+
+
+def pick(mix, chooser):
+    return chooser.choices([value for value, weight in mix], [weight for value, weight in mix])[0]
+
+
+def is_error(status, body):
+    """
+        Method checks whether a response failed; the routes answer some errors with status 200 and an 'error' field
+
+        @param:
+            status : the HTTP status
+            body : the body of the response as bytes
+
+        @return:
+            Boolean :  True if the request failed, False otherwise
+    """
+    if status >= 400:
+        return True
+    try:
+        response = json.loads(body)
+    except ValueError:
+        return True
+    return isinstance(response, dict) and 'error' in response
+
+
+def prepare_batches(client, bit_sizes, batch_size):
+    """
+        Method signs one batch of messages for every bit size so /verify_batch has something to check
+
+        @param:
+            client : the client the batches are signed through
+            bit_sizes : the bit sizes of the mix
+            batch_size : the number of messages in a batch
+
+        @return:
+            batches : dictionary of bit size -> JSON body for /verify_batch
+    """
+    batches = {}
+    messages = ["message " + str(index) for index in range(batch_size)]
+    for bit_size in bit_sizes:
+        status, body = client.post('/sign_batch', json_body={'messages': messages, 'bit_size': bit_size})
+        if is_error(status, body):
+            raise RuntimeError("[Error] Could not sign a batch of " + str(bit_size) + " bits to verify.")
+        signed = json.loads(body)
+        batches[bit_size] = {'public_key': signed['public_key'], 'format': signed.get('format', 'decimal'),
+                             'digest': signed.get('digest', 'sha512'),
+                             'pairs': [list(pair) for pair in zip(messages, signed['signatures'])]}
+    return batches
+
+
+def make_request(route, bit_sizes, chooser, batch_size, batches):
+    """
+        Method builds one request of a route
+
+        @return:
+            path : the path to send it to
+            label : the bit sizes it is reported under
+            form : the form fields, or None
+            json_body : the JSON body, or None
+    """
+    bit_size = pick(bit_sizes, chooser)
+    if route == 'process':
+        return '/process', str(bit_size), {'original_input': 'load test', 'new_input': 'load test',
+                                           'first_bit_size': bit_size}, None
+    if route == 'time_process':
+        second_bit_size = pick(bit_sizes, chooser)
+        return '/time_process', str(bit_size) + '/' + str(second_bit_size), {
+            'original_input': 'load test', 'new_input': 'load test', 'first_bit_size': bit_size,
+            'second_bit_size': second_bit_size}, None
+    if route == 'sign_batch':
+        return '/sign_batch', str(bit_size), None, {
+            'messages': ["load test " + str(index) for index in range(batch_size)], 'bit_size': bit_size}
+    return '/verify_batch', str(bit_size), None, batches[bit_size]
+
+
+def run(make_client, route_mix, bit_size_mix, concurrency, rate=0, duration=None, total_requests=None,
+        batch_size=100, seed=None):
+    """
+        Method sends requests from a number of threads and measures every one of them
+            - With a rate, request i is due at start + i / rate whatever the threads are doing, and its latency is
+              measured from when it was due, so a slow server can not hide its queueing delay by slowing the sender
+            - Each thread keeps its own samples, they are only merged once every thread has stopped
+
+        @param:
+            make_client : method that makes a client, called once per thread
+            route_mix : list of (route, weight)
+            bit_size_mix : list of (bit size, weight)
+            concurrency : the number of threads sending requests
+            rate : requests per second over all the threads, 0 to send as fast as possible
+            duration : the seconds to send requests for, None to stop after total_requests
+            total_requests : the number of requests to send, None to stop after duration
+            batch_size : the number of messages in every /sign_batch and /verify_batch request
+            seed : the seed of the random mix, None for a random one
+
+        @return:
+            results : dictionary of the host, configuration, per bit size summary of every route and totals
+    """
+    batches = {}
+    if any(route == 'verify_batch' for route, weight in route_mix):
+        batches = prepare_batches(make_client(), [bit_size for bit_size, weight in bit_size_mix], batch_size)
+
+    tickets = iter(range(total_requests)) if total_requests is not None else itertools.count()
+    ticket_lock = threading.Lock()
+    samples = [[] for n in range(concurrency)]
+    start = time.perf_counter()
+    end = start + duration if duration is not None else None
+
+    def worker(index):
+        client = make_client()
+        chooser = random.Random(None if seed is None else seed + index)
+        while True:
+            with ticket_lock:
+                ticket = next(tickets, None)
+            if ticket is None:
+                return
+            due = start + ticket / rate if rate else time.perf_counter()
+            if end is not None and due >= end:
+                return
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            path, label, form, json_body = make_request(pick(route_mix, chooser), bit_size_mix, chooser, batch_size,
+                                                        batches)
+            try:
+                status, body = client.post(path, form, json_body)
+                failed = is_error(status, body)
+            except (OSError, http.client.HTTPException):
+                failed = True
+            samples[index].append((path[1:], label, (time.perf_counter() - due) * 1e9, failed))
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    merged = [sample for thread_samples in samples for sample in thread_samples]
+    latencies = {}
+    totals = {}
+    for route, label, latency, failed in merged:
+        latencies.setdefault(label, {}).setdefault(route, []).append(latency)
+        route_totals = totals.setdefault(route, {'requests': 0, 'errors': 0})
+        route_totals['requests'] += 1
+        route_totals['errors'] += failed
+    all_totals = {'requests': len(merged), 'errors': sum(sample[3] for sample in merged)}
+    for route_totals in list(totals.values()) + [all_totals]:
+        route_totals['throughput'] = route_totals['requests'] / elapsed
+        route_totals['error_rate'] = route_totals['errors'] / route_totals['requests'] if route_totals['requests'] \
+            else 0.0
+    totals['all'] = all_totals
+    return {
+        'host': benchmark.host_info(),
+        'config': {'routes': dict(route_mix), 'bit_sizes': {str(size): weight for size, weight in bit_size_mix},
+                   'concurrency': concurrency, 'rate': rate, 'duration': duration, 'requests': total_requests,
+                   'batch_size': batch_size, 'elapsed': elapsed},
+        # Laid out like benchmark.py results so 'benchmark.py compare' works on two load test files
+        'results': {label: {route: benchmark.summarize(route_samples)
+                             for route, route_samples in label_latencies.items()}
+                    for label, label_latencies in sorted(latencies.items())},
+        'totals': totals,
+    }
+
+
+def print_results(results):
+    benchmark.print_results(results)
+    print("\n [Elapsed]: %.2f s" % results['config']['elapsed'])
+    for route, route_totals in results['totals'].items():
+        print("  [%s] requests: %d  throughput: %.2f/s  errors: %d (%.2f%%)" % (
+            route, route_totals['requests'], route_totals['throughput'], route_totals['errors'],
+            route_totals['error_rate'] * 100))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Sends concurrent requests to the website and reports throughput, "
+                                                 "error rate and latency percentiles.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help="address of a running server, http://127.0.0.1:5000")
+    target.add_argument('--in-process', action='store_true',
+                        help="send the requests to the application through Flask's test client")
+    parser.add_argument('--routes', nargs='+', default=['process'],
+                        help="routes to drive as route or route:weight, from " + ", ".join(routes))
+    parser.add_argument('--bit-sizes', nargs='+', default=['1024'],
+                        help="bit sizes to request as bits or bits:weight, 1024:3 2048:1")
+    parser.add_argument('--concurrency', type=int, default=4, help="number of threads sending requests")
+    parser.add_argument('--rate', type=float, default=0, help="requests per second, 0 to send as fast as possible")
+    parser.add_argument('--duration', type=float, default=None, help="seconds to send requests for")
+    parser.add_argument('--requests', type=int, default=None, help="number of requests to send, 100 by default")
+    parser.add_argument('--batch-size', type=int, default=100, help="messages in every batch request")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    arguments = parser.parse_args(arguments)
+
+    try:
+        route_mix = parse_mix(arguments.routes, routes)
+        bit_size_mix = parse_mix(arguments.bit_sizes)
+    except ValueError as error:
+        parser.error(str(error))
+    if arguments.concurrency < 1 or arguments.rate < 0 or arguments.batch_size < 1:
+        parser.error("concurrency and batch size must be at least 1 and the rate can not be negative")
+    if arguments.duration is None and arguments.requests is None:
+        arguments.requests = 100
+
+    if arguments.in_process:
+        make_client = InProcessClient
+    else:
+        make_client = lambda: HttpClient(arguments.url)
+    results = run(make_client, route_mix, bit_size_mix, arguments.concurrency, arguments.rate, arguments.duration,
+                  arguments.requests, arguments.batch_size, arguments.seed)
+    print_results(results)
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 1 if results['totals']['all']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
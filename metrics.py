@@ -0,0 +1,137 @@
+import time
+from functools import wraps
+from threading import Lock
+
+# Upper bounds, in seconds, of the latency histogram buckets. Reaches minutes for 8192+ bit key generation
+buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+           300.0)
+
+# Recording is off until enable() is called, so instrumented methods only pay for one check
+enabled = False
+
+lock = Lock()
+# (operation, bit_size) -> [count per bucket..., count above the last bucket, sum of seconds]
+histograms = {}
+# (operation, bit_size) -> number of calls that raised an exception
+errors = {}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with lock:
+        histograms.clear()
+        errors.clear()
+
+
+def observe(operation, bit_size, seconds):
+    """
+        Method records the latency of one call in the histogram of the operation and bit size
+
+        @param:
+            operation : the name of the instrumented method
+            bit_size : the bit size of the key, None if the method has no key
+            seconds : how long the call took
+    """
+    index = 0
+    while index < len(buckets) and seconds > buckets[index]:
+        index += 1
+    with lock:
+        histogram = histograms.get((operation, bit_size))
+        if histogram is None:
+            histogram = histograms[(operation, bit_size)] = [0] * (len(buckets) + 1) + [0.0]
+        histogram[index] += 1
+        histogram[-1] += seconds
+
+
+def instrument(operation, bit_size_of=None):
+    """
+        Method decorates a method so the latency of every call is recorded while metrics are enabled
+
+        @param:
+            operation : the name the calls are recorded under
+            bit_size_of : method given the same arguments as the decorated method that returns the bit size label
+
+        @return:
+            decorator : the decorator
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            bit_size = bit_size_of(*args, **kwargs) if bit_size_of else None
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                with lock:
+                    errors[(operation, bit_size)] = errors.get((operation, bit_size), 0) + 1
+                raise
+            finally:
+                observe(operation, bit_size, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def labels(operation, bit_size, extra=''):
+    text = 'operation="' + operation + '"'
+    if bit_size is not None:
+        text += ',bit_size="' + str(bit_size) + '"'
+    return '{' + text + extra + '}'
+
+
+def export(key_pool_stats=None):
+    """
+        Method exports the recorded metrics in the Prometheus text format
+
+        @param:
+            key_pool_stats : the stats of the key pool, signatures.key_pool.stats(), to export along with them
+
+        @return:
+            text : the metrics
+    """
+    with lock:
+        histogram_items = sorted(histograms.items(), key=lambda item: (item[0][0], item[0][1] or 0))
+        histogram_items = [(key, list(histogram)) for key, histogram in histogram_items]
+        error_items = sorted(errors.items(), key=lambda item: (item[0][0], item[0][1] or 0))
+
+    lines = ["# HELP signatures_operation_seconds Latency of key generation, signing and verifying.",
+             "# TYPE signatures_operation_seconds histogram"]
+    for (operation, bit_size), histogram in histogram_items:
+        cumulative = 0
+        for bound, count in zip(buckets, histogram):
+            cumulative += count
+            lines.append("signatures_operation_seconds_bucket" + labels(operation, bit_size, ',le="' + str(bound) + '"')
+                         + " " + str(cumulative))
+        cumulative += histogram[len(buckets)]
+        lines.append("signatures_operation_seconds_bucket" + labels(operation, bit_size, ',le="+Inf"') + " "
+                     + str(cumulative))
+        lines.append("signatures_operation_seconds_sum" + labels(operation, bit_size) + " " + repr(histogram[-1]))
+        lines.append("signatures_operation_seconds_count" + labels(operation, bit_size) + " " + str(cumulative))
+
+    lines.append("# HELP signatures_operation_errors_total Calls that raised an exception.")
+    lines.append("# TYPE signatures_operation_errors_total counter")
+    for (operation, bit_size), count in error_items:
+        lines.append("signatures_operation_errors_total" + labels(operation, bit_size) + " " + str(count))
+
+    if key_pool_stats is not None:
+        for name in ('hits', 'misses', 'evictions', 'refills', 'refill_failures', 'bypasses'):
+            lines.append("# TYPE signatures_key_pool_" + name + "_total counter")
+            lines.append("signatures_key_pool_" + name + "_total " + str(key_pool_stats[name]))
+        lines.append("# TYPE signatures_key_pool_refill_seconds_total counter")
+        lines.append("signatures_key_pool_refill_seconds_total " + repr(key_pool_stats['refill_time_total']))
+        lines.append("# TYPE signatures_key_pool_refill_seconds_max gauge")
+        lines.append("signatures_key_pool_refill_seconds_max " + repr(key_pool_stats['refill_time_max']))
+        lines.append("# TYPE signatures_key_pool_ready gauge")
+        for bit_size, size_stats in sorted(key_pool_stats['sizes'].items()):
+            lines.append('signatures_key_pool_ready{bit_size="' + str(bit_size) + '"} ' + str(size_stats['ready']))
+    return "\n".join(lines) + "\n"
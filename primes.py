@@ -0,0 +1,191 @@
+import os
+import queue
+import secrets
+from math import gcd
+from multiprocessing import Pool
+from Cryptodome.PublicKey import RSA
+import arithmetic
+
+# Number of odd candidates that are sieved at a time
+sieve_window = 4096
+# Miller-Rabin rounds by the size of the prime, enough for an error below 2^-100 on random candidates (FIPS 186-4)
+miller_rabin_rounds = ((1536, 3), (1024, 4), (512, 7), (256, 16), (0, 40))
+
+
+def small_primes_up_to(limit):
+    """
+        Method finds every prime up to a limit with the sieve of Eratosthenes
+
+        @param:
+            limit : the largest number to check
+
+        @return:
+            primes : list of the primes, in order
+    """
+    is_prime = bytearray([1]) * (limit + 1)
+    is_prime[0:2] = b'\x00\x00'
+    for number in range(2, int(limit ** 0.5) + 1):
+        if is_prime[number]:
+            is_prime[number * number::number] = bytes(len(range(number * number, limit + 1, number)))
+    return [number for number in range(limit + 1) if is_prime[number]]
+
+
+# Odd primes that candidates are sieved by before any Miller-Rabin test
+small_primes = small_primes_up_to(1 << 14)[1:]
+
+
+def rounds_for(bits):
+    for min_bits, rounds in miller_rabin_rounds:
+        if bits >= min_bits:
+            return rounds
+    return miller_rabin_rounds[-1][1]
+
+
+def is_probable_prime(candidate, rounds):
+    """
+        Method checks whether an odd number is prime with the Miller-Rabin test using random bases
+
+        @param:
+            candidate : an odd number larger than the largest small prime
+            rounds : the number of bases to try
+
+        @return:
+            Boolean :  True if the number passed every round, False if it is composite
+    """
+    d = candidate - 1
+    s = 0
+    while not d & 1:
+        d >>= 1
+        s += 1
+    for n in range(rounds):
+        base = secrets.randbelow(candidate - 3) + 2
+        x = arithmetic.powmod(base, d, candidate)
+        if x == 1 or x == candidate - 1:
+            continue
+        for r in range(s - 1):
+            x = x * x % candidate
+            if x == candidate - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def generate_prime(bits, e=65537):
+    """
+        Method finds a random prime by searching upwards from a random starting point:
+            - a window of odd candidates is sieved by every small prime at once, marking multiples in a bytearray
+            - only the candidates left are tested with Miller-Rabin, with the number of rounds tuned to the size
+            - the top two bits are always set so the product of two primes has exactly twice the bits
+
+        @param:
+            bits : the size of the prime in bits
+            e : the public exponent, p - 1 must not be a multiple of it
+
+        @return:
+            prime : the prime
+    """
+    rounds = rounds_for(bits)
+    top_bits = 3 << (bits - 2)
+    while True:
+        start = secrets.randbits(bits) | top_bits | 1
+        while start.bit_length() == bits:
+            # composite[k] is set when start + 2k is divisible by a small prime
+            composite = bytearray(sieve_window)
+            for prime in small_primes:
+                # First k where start + 2k = 0 mod prime; the inverse of 2 modulo prime is (prime + 1) / 2
+                first = (-start * ((prime + 1) >> 1)) % prime
+                composite[first::prime] = b'\x01' * len(range(first, sieve_window, prime))
+            for offset in range(sieve_window):
+                if composite[offset]:
+                    continue
+                candidate = start + 2 * offset
+                if candidate.bit_length() != bits:
+                    break
+                if (candidate - 1) % e != 0 and is_probable_prime(candidate, rounds):
+                    return candidate
+            start += 2 * sieve_window
+
+
+def is_valid_pair(p, q, bit_size):
+    """
+        Method checks whether two primes make a modulus of the right size that is safe to use
+            - p and q must not be too close, or n can be factored by starting at its square root
+
+        @param:
+            p : the first prime
+            q : the second prime
+            bit_size : the size the modulus must have
+
+        @return:
+            Boolean :  True if the primes can be used, False otherwise
+    """
+    return abs(p - q).bit_length() > bit_size // 2 - 100 and (p * q).bit_length() == bit_size
+
+
+def construct_key(p, q, e=65537):
+    lambda_n = (p - 1) * (q - 1) // gcd(p - 1, q - 1)
+    d = pow(e, -1, lambda_n)
+    return RSA.construct((p * q, e, d, p, q))
+
+
+def generate_key(bit_size, e=65537):
+    """
+        Method generates a RSA key pair from two primes found by generate_prime()
+
+        @param:
+            bit_size : the size of the modulus in bits
+            e : the public exponent
+
+        @return:
+            key_pair : a PyCryptodome RSA key, the same as from RSA.generate
+    """
+    while True:
+        p = generate_prime((bit_size + 1) // 2, e)
+        q = generate_prime(bit_size // 2, e)
+        if is_valid_pair(p, q, bit_size):
+            return construct_key(p, q, e)
+
+
+def generate_key_parallel(bit_size, workers=None, e=65537):
+    """
+        Method generates a RSA key pair by searching for p and q at the same time on worker processes
+            - Every worker searches from its own random start; with more than two workers the extra searches are
+              speculative and whichever two primes are found first are used
+            - Once a pair is found the workers that are still searching are stopped
+
+        @param:
+            bit_size : the size of the modulus in bits
+            workers : the number of worker processes, at least 2. Defaults to the number of cores
+            e : the public exponent
+
+        @return:
+            key_pair : a PyCryptodome RSA key, the same as from RSA.generate
+    """
+    workers = max(2, workers or os.cpu_count() or 1)
+    sizes = ((bit_size + 1) // 2, bit_size // 2)
+    found = queue.Queue()
+    p_candidates = []
+    q_candidates = []
+
+    # Leaving the with block terminates the pool, which stops the searches that are still running
+    with Pool(processes=workers) as pool:
+        def search(bits):
+            pool.apply_async(generate_prime, (bits, e), callback=found.put, error_callback=found.put)
+
+        for index in range(workers):
+            search(sizes[index % 2])
+        while True:
+            prime = found.get()
+            if isinstance(prime, BaseException):
+                raise prime
+            if prime.bit_length() == sizes[0]:
+                p_candidates.append(prime)
+            # With an even bit size a prime can be used as either p or q
+            if prime.bit_length() == sizes[1]:
+                q_candidates.append(prime)
+            for p in p_candidates:
+                for q in q_candidates:
+                    if p != q and is_valid_pair(p, q, bit_size):
+                        return construct_key(p, q, e)
+            search(prime.bit_length())
@@ -0,0 +1,147 @@
+import base64
+import os
+from Cryptodome.PublicKey import RSA
+
+# Formats that integers such as signatures and hashes can be written in. 'der' writes keys as base64url DER and
+# integers as base64url
+formats = ('hex', 'base64url', 'der', 'decimal')
+# Format used when none is asked for. Decimal is about 2.4 times longer than hex and slow to make for large moduli
+default_format = os.environ.get('SIGNATURES_OUTPUT_FORMAT', 'hex')
+# Decimal digits below which str() and int() are used directly. Python 3.11+ refuses more than 4300 by default
+decimal_chunk_digits = 1000
+
+
+def to_decimal(value):
+    """
+        Method writes a non-negative integer in decimal by splitting it in halves with divmod by a power of ten
+            - Each half is converted separately, so it is never limited by sys.get_int_max_str_digits()
+
+        @param:
+            value : the integer
+
+        @return:
+            text : the decimal digits
+    """
+    if value < 10 ** decimal_chunk_digits:
+        return str(value)
+    digits = decimal_chunk_digits
+    while 10 ** (digits * 2) <= value:
+        digits *= 2
+    high, low = divmod(value, 10 ** digits)
+    return to_decimal(high) + to_decimal(low).zfill(digits)
+
+
+def from_decimal(text):
+    """
+        Method reads a non-negative integer written in decimal, the opposite of to_decimal()
+
+        @param:
+            text : the decimal digits
+
+        @return:
+            value : the integer
+    """
+    if len(text) <= decimal_chunk_digits:
+        return int(text)
+    if not text.isdigit():
+        raise ValueError("[Error] Not a decimal integer.")
+    split = len(text) // 2
+    return from_decimal(text[:split]) * 10 ** (len(text) - split) + from_decimal(text[split:])
+
+
+def check_format(output_format):
+    """
+        Method gets the format to use, the default if none is given
+
+        @param:
+            output_format : one of formats or None
+
+        @return:
+            output_format : the format to use
+    """
+    output_format = output_format or default_format
+    if output_format not in formats:
+        raise ValueError("[Error] Unknown format: " + str(output_format) + ". Try one of " + ", ".join(formats) + ".")
+    return output_format
+
+
+def encode_int(value, output_format=None):
+    """
+        Method writes an integer such as a signature or a hash in a format
+
+        @param:
+            value : the non-negative integer
+            output_format : one of formats, default_format if None
+
+        @return:
+            text : the written integer
+    """
+    output_format = check_format(output_format)
+    if output_format == 'hex':
+        return format(value, 'x')
+    if output_format == 'decimal':
+        return to_decimal(value)
+    raw = value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_int(text, input_format=None):
+    """
+        Method reads an integer written by encode_int()
+
+        @param:
+            text : the written integer
+            input_format : the format it was written in, default_format if None
+
+        @return:
+            value : the integer
+    """
+    input_format = check_format(input_format)
+    text = str(text)
+    if input_format == 'hex':
+        return int(text, 16)
+    if input_format == 'decimal':
+        return from_decimal(text)
+    return int.from_bytes(base64.urlsafe_b64decode(text + '=' * (-len(text) % 4)), 'big')
+
+
+def encode_key(key_pair, output_format=None, private=False):
+    """
+        Method writes the public key (n, e) or the private key (n, d) of a key pair
+
+        @param:
+            key_pair : the key pair
+            output_format : one of formats, default_format if None. 'der' writes the key as base64url DER
+            private : boolean whether the private key is written instead of the public one
+
+        @return:
+            text : the written key, "(n, e)" or "(n, d)" unless the format is 'der'
+    """
+    output_format = check_format(output_format)
+    if output_format == 'der':
+        if not private:
+            der = RSA.construct((key_pair.n, key_pair.e)).export_key('DER')
+        elif hasattr(key_pair, 'export_key'):
+            der = key_pair.export_key('DER')
+        else:
+            raise ValueError("[Error] Private keys of multi-prime key pairs can not be written as DER.")
+        return base64.urlsafe_b64encode(der).rstrip(b'=').decode('ascii')
+    exponent = key_pair.d if private else key_pair.e
+    return "(" + encode_int(key_pair.n, output_format) + ", " + encode_int(exponent, output_format) + ")"
+
+
+def decode_public_key(public_key, input_format=None):
+    """
+        Method reads a public key sent as {'n': ..., 'e': ...}, or as a base64url DER string in the 'der' format
+
+        @param:
+            public_key : the sent public key
+            input_format : the format it was written in, default_format if None
+
+        @return:
+            key : a PyCryptodome RSA public key
+    """
+    input_format = check_format(input_format)
+    if input_format == 'der' and isinstance(public_key, str):
+        return RSA.import_key(base64.urlsafe_b64decode(public_key + '=' * (-len(public_key) % 4)))
+    return RSA.construct((decode_int(public_key['n'], input_format), decode_int(public_key['e'], input_format)))
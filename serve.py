@@ -0,0 +1,198 @@
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+import server
+import signatures
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """
+        The standard library WSGI server with a thread per request, so streamed responses such as /sign_batch do not
+        hold up the rest of a worker. server_close() waits for the requests that are still running.
+    """
+    daemon_threads = False
+
+
+class QuietHandler(WSGIRequestHandler):
+    """
+        Request handler that only writes the access log when asked to with --access-log
+    """
+    access_log = False
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+
+class Recycler:
+    """
+        WSGI middleware that stops a worker after it has handled a number of requests so that a fresh one takes
+        its place; the requests that are still running are finished first
+
+        @param:
+            app : the WSGI application
+            httpd : the server of the worker
+            max_requests : the number of requests before the worker stops, 0 to never stop
+    """
+
+    def __init__(self, app, httpd, max_requests):
+        self.app = app
+        self.httpd = httpd
+        self.max_requests = max_requests
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.requests += 1
+            is_last = self.requests == self.max_requests
+        if is_last:
+            # shutdown() waits for serve_forever() to return so it can not be called on a thread it is serving
+            threading.Thread(target=self.httpd.shutdown).start()
+        return self.app(environ, start_response)
+
+
+def warm(bit_sizes, count):
+    """
+        Method fills the key pool and loads the saved key pairs of some bit sizes before a worker takes requests
+            - Done inside each worker so that no two workers hand out the same key pair
+
+        @param:
+            bit_sizes : the bit sizes to warm
+            count : the number of key pairs to have ready in the pool for every bit size
+    """
+    for bit_size in bit_sizes:
+        signatures.key_pool.warm(bit_size, count)
+        signatures.keystore.get(bit_size)
+
+
+def run_worker(listener, arguments):
+    """
+        Method runs one worker process: warms it, then serves requests from the shared socket until it is recycled
+        or told to stop
+
+        @param:
+            listener : the listening socket shared by every worker
+            arguments : the parsed command line arguments
+    """
+    warm(arguments.warm_bit_sizes, arguments.warm_count)
+
+    host, port = listener.getsockname()[:2]
+    httpd = ThreadingWSGIServer((host, port), QuietHandler, bind_and_activate=False)
+    httpd.socket.close()
+    httpd.socket = listener
+    httpd.server_name = socket.getfqdn(host)
+    httpd.server_port = port
+    httpd.setup_environ()
+
+    max_requests = arguments.max_requests
+    if max_requests and arguments.max_requests_jitter:
+        max_requests += random.randint(0, arguments.max_requests_jitter)
+    httpd.set_app(Recycler(server.app, httpd, max_requests))
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=httpd.shutdown).start())
+    print("[Worker " + str(os.getpid()) + "] Ready", flush=True)
+    httpd.serve_forever()
+    httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the website on several worker processes that share one socket.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes. Defaults to the number of cores")
+    parser.add_argument('--max-requests', type=int, default=1000,
+                        help="requests a worker handles before it is replaced by a fresh one, 0 to never replace it")
+    parser.add_argument('--max-requests-jitter', type=int, default=100,
+                        help="up to this many requests are added to --max-requests so workers are not all replaced "
+                             "at once")
+    parser.add_argument('--warm-bit-sizes', type=int, nargs='*', default=[1024, 2048],
+                        help="bit sizes whose key pool is filled before a worker takes requests")
+    parser.add_argument('--warm-count', type=int, default=None,
+                        help="key pairs to have ready for every bit size. Defaults to the high watermark of the pool")
+    parser.add_argument('--backlog', type=int, default=128)
+    parser.add_argument('--access-log', action='store_true')
+    arguments = parser.parse_args(argv)
+    QuietHandler.access_log = arguments.access_log
+
+    for bit_size in arguments.warm_bit_sizes:
+        if not signatures.bit_size_checking(bit_size):
+            parser.error("[Error] Incorrect type. Try an integer that is a multiple of 1024.")
+        if int(bit_size) > signatures.key_pool.max_bit_size:
+            parser.error("[Error] Only bit sizes up to " + str(signatures.key_pool.max_bit_size) + " can be pooled. "
+                         "Set SIGNATURES_POOL_MAX_BIT_SIZE to pool larger ones.")
+
+    listener = socket.create_server((arguments.host, arguments.port), backlog=arguments.backlog)
+    print("Serving on http://" + arguments.host + ":" + str(arguments.port) + "/ with " + str(arguments.workers) +
+          " workers", flush=True)
+
+    if not hasattr(os, 'fork') or arguments.workers <= 1:
+        try:
+            run_worker(listener, arguments)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    # A background job only exists in the worker that started it, and the next request may go to another worker
+    server.background_jobs = False
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # The parent decides when workers stop, Ctrl+C is sent to the whole process group. A worker that is told
+            # to stop while it is still warming up just exits
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 1
+            try:
+                run_worker(listener, arguments)
+                status = 0
+            finally:
+                os._exit(status)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for n in range(arguments.workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        if os.waitstatus_to_exitcode(status) != 0:
+            print("[Error] Worker " + str(pid) + " stopped unexpectedly, starting a new one", file=sys.stderr,
+                  flush=True)
+            # Do not restart a worker that keeps failing straight away as fast as possible
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+        spawn()
+    listener.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,26 @@
-from flask import Flask, request, render_template, jsonify
+import json
+import os
+from flask import Flask, request, render_template, jsonify, Response
 import signatures
+import metrics
+import arithmetic
+import serialization
+from jobs import JobRunner, JobQueueFull
 
 app = Flask(__name__)
 
+# Runs /process and /time_process in the background when they are sent with async=true
+job_runner = JobRunner(max_workers=int(os.environ.get('SIGNATURES_JOB_WORKERS', '2')),
+                       max_pending=int(os.environ.get('SIGNATURES_JOB_PENDING', '16')))
+
+# Requests sent with async=true are run inline instead when turned off with SIGNATURES_BACKGROUND_JOBS=0, which
+# serve.py does when it runs more than one worker process since a job only exists in the worker that started it
+background_jobs = os.environ.get('SIGNATURES_BACKGROUND_JOBS', '1') != '0'
+
+# Latency of generate, signing and verify is recorded unless turned off with SIGNATURES_METRICS=0
+if os.environ.get('SIGNATURES_METRICS', '1') != '0':
+    metrics.enable()
+
 
 @app.route('/')
 def homepage():
@@ -44,6 +62,14 @@ def process():
         bit_size = request.form['first_bit_size']
     except KeyError:
         return jsonify({'error': '[Error] Incorrect Key.'})
+    reuse_key = request.form.get('reuse_key') == 'true'
+    primes = request.form.get('primes') or '2'
+    output_format = request.form.get('format') or serialization.default_format
+    if output_format not in serialization.formats:
+        return jsonify({'error': '[Error] Unknown format. Try one of ' + ', '.join(serialization.formats) + '.'})
+    digest = request.form.get('digest') or signatures.default_digest
+    if digest not in signatures.digests:
+        return jsonify({'error': '[Error] Unsupported digest. Try one of ' + ', '.join(signatures.digests) + '.'})
 
     if new_input and original_input:
         if bit_size == '':
@@ -52,20 +78,166 @@ def process():
         elif not signatures.bit_size_checking(bit_size):
             return jsonify({'error': '[Error] Incorrect type. Try an integer that is a multiple of 1024.'})
 
-        public_key, private_key, original_hash, hashed, valid, signature = signatures.demonstration(original_input,
-                                                                                                    new_input,
-                                                                                                    int(bit_size))
+        if not signatures.prime_count_checking(bit_size, primes):
+            return jsonify({'error': signatures.multi_prime_error})
 
-        return jsonify(
-            {'first_bit_size': bit_size, 'publicKey': public_key, 'privateKey': private_key,
-             'originalSignature': str(original_hash), 'newSignature': str(hashed),
-             'name': str(signature) + " and is: " + str(valid)}
-        )
+        if output_format == 'der' and int(primes) > 2:
+            return jsonify({'error': '[Error] Multi-prime key pairs can not be written as DER.'})
+
+        if request.form.get('async') == 'true':
+            return submit_job(process_result, original_input, new_input, bit_size, reuse_key, int(primes),
+                              output_format, digest)
+        return jsonify(process_result(None, original_input, new_input, bit_size, reuse_key, int(primes),
+                                      output_format, digest))
 
     else:
         return jsonify({'error': '[Error] Missing data.'})
 
 
+def process_result(job, original_input, new_input, bit_size, reuse_key, primes, output_format, digest):
+    """
+        Helper method: process(), either inside the request or as a background job
+            - Keys, hashes and the signature are written in output_format
+            - The data is hashed with digest
+    """
+    report(job, 0.0, "Signing and verifying with " + str(bit_size) + " bits")
+    public_key, private_key, original_hash, hashed, valid, signature = signatures.demonstration(
+        original_input, new_input, int(bit_size), use_pool=True, use_keystore=reuse_key, primes=primes,
+        output_format=output_format, digest=digest)
+
+    return {'first_bit_size': bit_size, 'publicKey': public_key, 'privateKey': private_key,
+            'originalSignature': serialization.encode_int(original_hash, output_format),
+            'newSignature': serialization.encode_int(hashed, output_format),
+            'name': serialization.encode_int(signature, output_format) + " and is: " + str(valid),
+            'format': output_format, 'digest': digest}
+
+
+# Most messages that can be signed in one /sign_batch request
+sign_batch_limit = int(os.environ.get('SIGNATURES_SIGN_BATCH_LIMIT', '100000'))
+# Most pairs that can be verified in one /verify_batch request
+verify_batch_limit = int(os.environ.get('SIGNATURES_VERIFY_BATCH_LIMIT', '100000'))
+
+
+@app.route('/sign_batch', methods=['POST'])
+def sign_batch():
+    """
+        Signs many messages with one key pair in a single request.
+
+        Expects a JSON body of;
+            - messages : list of messages
+            - bit_size : the bit size of the key pair, 1024 if not given
+            - reuse_key : true to sign with the saved key pair of that bit size instead of one from the key pool
+            - format : the format of the public key and signatures, one of serialization.formats
+            - digest : the digest the messages are hashed with, one of signatures.digests
+
+        Streams back the public key and the signature of every message, in order, as they are made.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': '[Error] Expected a JSON body.'})
+
+    messages = body.get('messages')
+    bit_size = body.get('bit_size', 1024)
+    output_format = body.get('format') or serialization.default_format
+    if output_format not in serialization.formats:
+        return jsonify({'error': '[Error] Unknown format. Try one of ' + ', '.join(serialization.formats) + '.'})
+    digest = body.get('digest') or signatures.default_digest
+    if digest not in signatures.digests:
+        return jsonify({'error': '[Error] Unsupported digest. Try one of ' + ', '.join(signatures.digests) + '.'})
+    if not isinstance(messages, list) or not all(isinstance(message, str) for message in messages):
+        return jsonify({'error': '[Error] Incorrect Key. messages must be a list of strings.'})
+    if len(messages) > sign_batch_limit:
+        return jsonify({'error': '[Error] Too many messages. At most ' + str(sign_batch_limit) + ' per request.'})
+    # JSON numbers such as 1024.5 would otherwise be cut down to an integer by bit_size_checking
+    if isinstance(bit_size, bool) or not isinstance(bit_size, int) or not signatures.bit_size_checking(bit_size):
+        return jsonify({'error': '[Error] Incorrect type. Try an integer that is a multiple of 1024.'})
+
+    if body.get('reuse_key'):
+        key_pair = signatures.keystore.get_or_generate(int(bit_size), signatures.generate)
+    else:
+        key_pair = signatures.key_pool.acquire(int(bit_size))
+
+    if output_format == 'der':
+        public_key = json.dumps(serialization.encode_key(key_pair, output_format))
+    else:
+        public_key = json.dumps({'n': serialization.encode_int(key_pair.n, output_format),
+                                 'e': serialization.encode_int(key_pair.e, output_format)})
+
+    def stream():
+        yield '{"format": "' + output_format + '", "digest": "' + digest + '", "public_key": ' + public_key + \
+            ', "signatures": ['
+        separator = ''
+        for signature in signatures.iter_sign_batch(key_pair, messages, digest=digest):
+            yield separator + '"' + serialization.encode_int(signature, output_format) + '"'
+            separator = ', '
+        yield ']}'
+
+    return Response(stream(), mimetype='application/json')
+
+
+@app.route('/verify_batch', methods=['POST'])
+def verify_batch():
+    """
+        Verifies many signatures made with one public key in a single request.
+
+        Expects a JSON body of;
+            - public_key : {'n': ..., 'e': ...}, or a base64url DER string in the 'der' format
+            - pairs : list of [data, signature]
+            - format : the format the public key and signatures are written in, one of serialization.formats
+            - digest : the digest the messages were hashed with, one of signatures.digests
+
+        Returns a boolean for every pair along with the indices of the pairs that are not valid.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': '[Error] Expected a JSON body.'})
+
+    input_format = body.get('format') or serialization.default_format
+    if input_format not in serialization.formats:
+        return jsonify({'error': '[Error] Unknown format. Try one of ' + ', '.join(serialization.formats) + '.'})
+    digest = body.get('digest') or signatures.default_digest
+    if digest not in signatures.digests:
+        return jsonify({'error': '[Error] Unsupported digest. Try one of ' + ', '.join(signatures.digests) + '.'})
+    if isinstance(body.get('pairs'), list) and len(body['pairs']) > verify_batch_limit:
+        return jsonify({'error': '[Error] Too many pairs. At most ' + str(verify_batch_limit) + ' per request.'})
+    try:
+        public_key = serialization.decode_public_key(body['public_key'], input_format)
+        pairs = [(str(data), serialization.decode_int(signature, input_format)) for data, signature in body['pairs']]
+    except (KeyError, TypeError):
+        return jsonify({'error': '[Error] Incorrect Key.'})
+    except ValueError:
+        return jsonify({'error': '[Error] Incorrect type. Keys and signatures must be integers written in '
+                                 + input_format + '.'})
+
+    results, failing = signatures.verify_batch(pairs, public_key, cache=signatures.verification_cache, digest=digest)
+    return jsonify({'results': results, 'failing': failing, 'valid': len(results) - len(failing), 'digest': digest})
+
+
+@app.route('/verify_cache')
+def verify_cache():
+    """
+        Counters of the verification cache; size, hits, misses, evictions and expirations.
+    """
+    return jsonify(signatures.verification_cache.stats())
+
+
+@app.route('/key_pool')
+def key_pool():
+    """
+        Counters of the pre-generated key pool; hits, misses, evictions and refill latency used to size the pool.
+    """
+    return jsonify(signatures.key_pool.stats())
+
+
+@app.route('/metrics')
+def metrics_export():
+    """
+        Latency histograms of key generation, signing and verifying by bit size, and the key pool counters,
+        in the Prometheus text format.
+    """
+    return Response(metrics.export(signatures.key_pool.stats()), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/time_difference')
 def time_difference():
     return render_template("time_difference.html")
@@ -89,31 +261,113 @@ def time_process():
     except KeyError:
         return jsonify({'error': '[Error] Incorrect Key.'})
 
+    primes = request.form.get('primes') or '2'
+
     if not signatures.bit_size_checking(first_bit_size) or not signatures.bit_size_checking(second_bit_size):
         return jsonify({'error': '[Error] Incorrect type. Try an integer that is a multiple of 1024.'})
 
+    elif not signatures.prime_count_checking(first_bit_size, primes) or \
+            not signatures.prime_count_checking(second_bit_size, primes):
+        return jsonify({'error': signatures.multi_prime_error})
+
     elif first_bit_size and second_bit_size and new_input and original_input:
-        difference_in_time, valid, first_run_time, second_run_time = signatures.time_difference(int(first_bit_size),
-                                                                                                int(second_bit_size),
-                                                                                                original_input,
-                                                                                                new_input)
+        if request.form.get('async') == 'true':
+            return submit_job(time_process_result, first_bit_size, second_bit_size, original_input, new_input,
+                              int(primes))
+        return jsonify(time_process_result(None, first_bit_size, second_bit_size, original_input, new_input,
+                                           int(primes)))
 
-        first_run_time = float(first_run_time)
-        first_run_time = str(first_run_time)
+    else:
+        return jsonify({'error': '[Error] Missing data.'})
 
-        second_run_time = float(second_run_time)
-        second_run_time = str(second_run_time)
 
-        first_run = first_bit_size + " with a time of: " + first_run_time
-        second_run = second_bit_size + " with a time of: " + second_run_time
+def time_process_result(job, first_bit_size, second_bit_size, original_input, new_input, primes):
+    """
+        Helper method: time_process(), either inside the request or as a background job
+    """
+    difference_in_time, valid, first_run_time, second_run_time, first_key_pair, second_key_pair = \
+        signatures.time_difference(int(first_bit_size), int(second_bit_size), original_input, new_input,
+                                   progress=lambda fraction, message: report(job, fraction * 0.9, message),
+                                   primes=primes)
 
-        return jsonify(
-            {'first_bit_size': str(first_run), 'second_bit_size': str(second_run),
-             'difference': str(difference_in_time) + " seconds", 'name': str(valid), }
-        )
+    first_run_time = float(first_run_time)
+    first_run_time = str(first_run_time)
 
-    else:
-        return jsonify({'error': '[Error] Missing data.'})
+    second_run_time = float(second_run_time)
+    second_run_time = str(second_run_time)
+
+    first_run = first_bit_size + " with a time of: " + first_run_time
+    second_run = second_bit_size + " with a time of: " + second_run_time
+
+    report(job, 0.9, "Comparing signing with and without CRT")
+    first_crt_time, first_plain_time = signatures.crt_comparison(first_key_pair, original_input)
+    second_crt_time, second_plain_time = signatures.crt_comparison(second_key_pair, original_input)
+    first_crt = first_bit_size + " signing with CRT: " + str(first_crt_time) + \
+        " without CRT: " + str(first_plain_time)
+    second_crt = second_bit_size + " signing with CRT: " + str(second_crt_time) + \
+        " without CRT: " + str(second_plain_time)
+
+    return {'first_bit_size': str(first_run), 'second_bit_size': str(second_run),
+            'difference': str(difference_in_time) + " seconds", 'name': str(valid),
+            'first_crt': first_crt, 'second_crt': second_crt, 'backend': arithmetic.backend}
+
+
+def report(job, progress, message):
+    """
+        Helper method: reports the progress of a background job, does nothing for work done inside the request
+    """
+    if job is not None:
+        job.update(progress=progress, message=message)
+
+
+def submit_job(function, *args):
+    """
+        Helper method: queues work as a background job and returns its id straight away
+            - When background_jobs is off the work is done inside the request and its result returned instead
+    """
+    if not background_jobs:
+        return jsonify(function(None, *args))
+    try:
+        job = job_runner.submit(function, *args)
+    except JobQueueFull as error:
+        return jsonify({'error': str(error)}), 503
+    return jsonify({'job_id': job.job_id}), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+        Status of a background job; queued, running, finished or failed, with its progress and final result.
+    """
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'error': '[Error] Unknown job.'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+        Server-Sent Events stream of a background job, sending its status every time it changes until it is done.
+    """
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'error': '[Error] Unknown job.'}), 404
+
+    def events():
+        version = -1
+        while True:
+            new_version = job.wait(version, 15)
+            if new_version == version and not job.is_done():
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            status = job.to_dict()
+            yield "data: " + json.dumps(status) + "\n\n"
+            if status['status'] in ('finished', 'failed'):
+                return
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 
 if __name__ == '__main__':
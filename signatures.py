@@ -1,62 +1,729 @@
+import mmap
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
+from math import gcd
+from collections import OrderedDict
+from threading import Lock
 from Cryptodome.PublicKey import RSA
-from hashlib import sha512
+from Cryptodome.Math.Primality import generate_probable_prime
+from Cryptodome.Random import get_random_bytes
+import hashlib
+from key_pool import KeyPool
+from keystore import KeyStore, fingerprint
+from verify_cache import VerificationCache
+import metrics
+import arithmetic
+import serialization
+import primes as prime_engine
+
+
+# Generators that two prime key pairs can be made with; RSA.generate or the sieving prime engine in primes.py
+generators = ('pycryptodome', 'sieve')
+default_generator = os.environ.get('SIGNATURES_GENERATOR', 'pycryptodome')
+
+# Digests that data can be hashed with before signing, by the name stored with a signature. Every one is at most
+# 512 bits so the hash is always smaller than 'n'
+digests = {'sha256': hashlib.sha256, 'sha512': hashlib.sha512, 'sha3_256': hashlib.sha3_256,
+           'blake2b': hashlib.blake2b}
+default_digest = os.environ.get('SIGNATURES_DIGEST', 'sha512')
+
+# Smallest bit size that may use each number of primes above two, so every prime stays at least 1365 bits and
+# 4 primes are only used from 8192 bits, as recommended for multi-prime RSA
+multi_prime_min_bit_sizes = {3: 4096, 4: 8192}
+multi_prime_counts = tuple(multi_prime_min_bit_sizes)
+multi_prime_error = "[Error] 3 primes are only allowed for bit sizes of 4096 and up, 4 primes for 8192 and up."
+
+
+class MultiPrimeKey:
+    """
+        RSA key pair whose modulus is the product of more than two primes.
+
+        Has the same 'n', 'e' and 'd' as a PyCryptodome key so verify() and signing without CRT work on it as is,
+        along with the CRT values used by multi_prime_signing():
+            - exponents : d mod (p - 1) for every prime
+            - coefficients : the inverse of the product of the primes before it, modulo every prime after the first
+
+        @param:
+            primes : the distinct primes
+            e : the public exponent
+    """
+
+    def __init__(self, primes, e=65537):
+        self.primes = tuple(primes)
+        self.e = e
+        self.n = 1
+        lambda_n = 1
+        for prime in self.primes:
+            self.n *= prime
+            lambda_n = lambda_n * (prime - 1) // gcd(lambda_n, prime - 1)
+        self.d = pow(e, -1, lambda_n)
+        self.exponents = tuple(self.d % (prime - 1) for prime in self.primes)
+        coefficients = [1]
+        product = self.primes[0]
+        for prime in self.primes[1:]:
+            coefficients.append(pow(product, -1, prime))
+            product *= prime
+        self.coefficients = tuple(coefficients)
+
+    def size_in_bits(self):
+        return self.n.bit_length()
+
+    def has_private(self):
+        return True
+
+
+class KeyContext:
+    """
+        The numbers of a key pair as plain ints, worked out once so that repeated signing and verifying with the same
+        key does no attribute lookups through PyCryptodome properties and no derivation per call.
+
+        Accepted anywhere a key pair is, and cheap to send to worker processes:
+            - n, e : the public key
+            - byte_length : the size of 'n' in bytes
+            - fingerprint : the fingerprint of the public key, the same as keystore.fingerprint()
+            - d, p, q, dp, dq, qinv : the private key and its CRT parameters, None for a public key
+            - primes, exponents, coefficients : the CRT values of a MultiPrimeKey, None otherwise
+
+        @param:
+            key_pair : a PyCryptodome key, a MultiPrimeKey or a public key
+    """
+    __slots__ = ('n', 'e', 'd', 'p', 'q', 'dp', 'dq', 'qinv', 'primes', 'exponents', 'coefficients',
+                 'byte_length', 'fingerprint')
+
+    def __init__(self, key_pair):
+        self.n = int(key_pair.n)
+        self.e = int(key_pair.e)
+        self.byte_length = (self.n.bit_length() + 7) // 8
+        self.fingerprint = fingerprint(key_pair)
+        self.d = self.p = self.q = self.dp = self.dq = self.qinv = None
+        self.primes = self.exponents = self.coefficients = None
+        if isinstance(key_pair, MultiPrimeKey):
+            self.d = key_pair.d
+            self.primes, self.exponents, self.coefficients = key_pair.primes, key_pair.exponents, key_pair.coefficients
+        elif key_pair.has_private():
+            self.d, self.p, self.q = int(key_pair.d), int(key_pair.p), int(key_pair.q)
+            self.dp = self.d % (self.p - 1)
+            self.dq = self.d % (self.q - 1)
+            self.qinv = pow(self.q, -1, self.p)
+
+    def size_in_bits(self):
+        return self.n.bit_length()
+
+    def has_private(self):
+        return self.d is not None
+
+
+def check_digest(digest):
+    """
+        Method gets the name of the digest to use, the default if none is given
+
+        @param:
+            digest : one of digests or None
+
+        @return:
+            digest : the name of the digest to use
+    """
+    digest = digest or default_digest
+    if digest not in digests:
+        raise ValueError("[Error] Unsupported digest: " + str(digest) + ". Try one of " + ", ".join(digests) + ".")
+    return digest
+
+
+def new_hasher(digest=None):
+    return digests[check_digest(digest)]()
+
+
+def integer_root(value, k):
+    """
+        Method gets the integer k-th root of a value, rounded down, without going through floats
+
+        @param:
+            value : a positive integer
+            k : the root
+
+        @return:
+            root : the largest integer whose k-th power is at most the value
+    """
+    root = 1 << ((value.bit_length() + k - 1) // k)
+    while True:
+        next_root = ((k - 1) * root + value // root ** (k - 1)) // k
+        if next_root >= root:
+            return root
+        root = next_root
+
+
+def generate_multi_prime(bit_size, prime_count, e=65537):
+    """
+        Method generates a RSA key pair whose modulus is the product of 3 or 4 primes
+            - Every prime is at least the k-th root of 2^(size of the prime * k - 1) so the product always has
+              exactly bit_size bits
+
+        @param:
+            bit_size : the size of the modulus in bits
+            prime_count : the number of primes
+            e : the public exponent
+
+        @return:
+            key_pair : a MultiPrimeKey
+    """
+    sizes = [bit_size // prime_count] * prime_count
+    for index in range(bit_size % prime_count):
+        sizes[index] += 1
+
+    primes = []
+    for size in sizes:
+        min_prime = integer_root(1 << (size * prime_count - 1), prime_count) + 1
+
+        def prime_filter(candidate, min_prime=min_prime):
+            candidate = int(candidate)
+            return candidate >= min_prime and gcd(candidate - 1, e) == 1 and candidate not in primes
+
+        primes.append(int(generate_probable_prime(exact_bits=size, randfunc=get_random_bytes,
+                                                  prime_filter=prime_filter)))
+    return MultiPrimeKey(primes, e)
 
 
-def generate(bit_size):
+@metrics.instrument('generate', lambda bit_size, *args, **kwargs: bit_size)
+def generate(bit_size, primes=2, generator=None, parallel=False, workers=None):
     """
         Method generates a RSA key pair with a size of some number of bits
 
         @param:
             bit_size : the size of the bits. 1024 on Demo page
+            primes : the number of primes in the modulus. 3 or 4 is only allowed from 4096 bits
+            generator : 'pycryptodome' to use RSA.generate or 'sieve' to use the prime engine in primes.py.
+                        Defaults to default_generator. Only used for 2 primes
+            parallel : boolean whether p and q are searched for at the same time on worker processes with the
+                       prime engine, whatever the generator. Only used for 2 primes
+            workers : the number of worker processes for a parallel search. Defaults to the number of cores
 
         @return:
             key_pair : this contains a public and private key
     """
-    key_pair = RSA.generate(bit_size)
+    generator = generator or default_generator
+    if primes == 2 and parallel:
+        key_pair = prime_engine.generate_key_parallel(bit_size, workers)
+    elif primes == 2 and generator == 'sieve':
+        key_pair = prime_engine.generate_key(bit_size)
+    elif primes == 2 and generator == 'pycryptodome':
+        key_pair = RSA.generate(bit_size)
+    elif primes == 2:
+        raise ValueError("[Error] Unknown generator: " + str(generator))
+    elif prime_count_checking(bit_size, primes):
+        key_pair = generate_multi_prime(bit_size, primes)
+    else:
+        raise ValueError(multi_prime_error)
     return key_pair
 
 
-def signing(key_pair, data):
+def prime_count_checking(bit_size, primes):
+    """
+        Method to error check the number of primes for a bit size
+
+        @param:
+            bit_size : the bit size of the key pair
+            primes : the number of primes
+
+        @return:
+            Boolean :  True if the number of primes is 2, 3 with a bit size of at least 4096 or 4 with a bit size of
+                       at least 8192. False otherwise
+    """
+    try:
+        primes = int(primes)
+        return primes == 2 or (primes in multi_prime_counts and int(bit_size) >= multi_prime_min_bit_sizes[primes])
+    except (ValueError, TypeError):
+        return False
+
+
+# Largest bit size that is pre-generated, larger ones are generated when they are asked for
+pool_max_bit_size = int(os.environ.get('SIGNATURES_POOL_MAX_BIT_SIZE', '4096'))
+# Pool of pre-generated key pairs so that requests do not have to wait on RSA.generate
+key_pool = KeyPool(generate, max_bit_size=pool_max_bit_size)
+# Pools of pre-generated multi-prime key pairs, by the number of primes. Each one can pool at least its smallest size
+multi_prime_pools = {prime_count: KeyPool(lambda bit_size, prime_count=prime_count: generate(bit_size, prime_count),
+                                          max_bit_size=max(pool_max_bit_size, multi_prime_min_bit_sizes[prime_count]))
+                     for prime_count in multi_prime_counts}
+
+
+def pool_for(primes):
+    """
+        Method gets the key pool for a number of primes
+
+        @param:
+            primes : the number of primes in the modulus
+
+        @return:
+            pool : the KeyPool for that number of primes
+    """
+    if primes == 2:
+        return key_pool
+    return multi_prime_pools[primes]
+
+# Saved key pairs that survive restarts, reused when asked so that no key has to be generated
+keystore = KeyStore(os.environ.get('SIGNATURES_KEYSTORE', 'keystore'))
+
+
+# Cache of the KeyContext of key pairs that are passed in as is, keyed by 'n', 'e' and whether it is private.
+# Public keys come from clients, so a key with the same 'n' but another 'e' must not get the cached context
+key_contexts = OrderedDict()
+key_contexts_size = 64
+key_contexts_lock = Lock()
+
+
+def key_context(key_pair):
+    """
+        Method gets the KeyContext of a key pair, building it once per key
+
+        @param:
+            key_pair : the key pair that was generated earlier, or a KeyContext which is given back as is
+
+        @return:
+            context : the KeyContext
+    """
+    if isinstance(key_pair, KeyContext):
+        return key_pair
+    cache_key = (key_pair.n, key_pair.e, key_pair.has_private())
+    with key_contexts_lock:
+        context = key_contexts.get(cache_key)
+        if context is not None:
+            key_contexts.move_to_end(cache_key)
+            return context
+    context = KeyContext(key_pair)
+    with key_contexts_lock:
+        key_contexts[cache_key] = context
+        while len(key_contexts) > key_contexts_size:
+            key_contexts.popitem(last=False)
+    return context
+
+
+def crt_signing(hashed, key_pair):
+    """
+        Method raises the hash to the power 'd' modulo 'n' using the Chinese Remainder Theorem:
+            - two exponentiations modulo 'p' and 'q' with half sized exponents instead of one modulo 'n'
+            - the result is checked against the public exponent so a faulty signature is never returned
+
+        @param:
+            hashed : the hash value of the message digest
+            key_pair : the key pair that was generated earlier, or its KeyContext
+
+        @return:
+            signature : the generated signature
+    """
+    context = key_context(key_pair)
+    if context.primes is not None:
+        return multi_prime_signing(hashed, context)
+    p, q = context.p, context.q
+    first = arithmetic.powmod(hashed, context.dp, p)
+    second = arithmetic.powmod(hashed, context.dq, q)
+    signature = second + q * ((context.qinv * (first - second)) % p)
+    if arithmetic.powmod(signature, context.e, context.n) != hashed % context.n:
+        raise ValueError("[Error] CRT signature failed the consistency check.")
+    return signature
+
+
+def multi_prime_signing(hashed, key_pair):
+    """
+        Method raises the hash to the power 'd' modulo 'n' for a key pair with more than two primes:
+            - one exponentiation modulo every prime with d mod (p - 1)
+            - the results are combined one prime at a time (Garner's method)
+            - the result is checked against the public exponent so a faulty signature is never returned
+
+        @param:
+            hashed : the hash value of the message digest
+            key_pair : a MultiPrimeKey, or its KeyContext
+
+        @return:
+            signature : the generated signature
+    """
+    primes, exponents, coefficients = key_pair.primes, key_pair.exponents, key_pair.coefficients
+    signature = arithmetic.powmod(hashed, exponents[0], primes[0])
+    product = primes[0]
+    for index in range(1, len(primes)):
+        prime = primes[index]
+        residue = arithmetic.powmod(hashed, exponents[index], prime)
+        signature += product * (((residue - signature) * coefficients[index]) % prime)
+        product *= prime
+    if arithmetic.powmod(signature, key_pair.e, key_pair.n) != hashed % key_pair.n:
+        raise ValueError("[Error] Multi-prime CRT signature failed the consistency check.")
+    return signature
+
+
+@metrics.instrument('signing', lambda key_pair, *args, **kwargs: key_pair.n.bit_length())
+def signing(key_pair, data, use_crt=True, digest=None):
     """
         Method signs a message that is entered by a user:
             - encrypts the message by calculating its hash and raising to the power 'd' modulo 'n'
 
         @param:
-            key_pair : the key pair that was generated earlier. Used to create a hash
+            key_pair : the key pair that was generated earlier, or its KeyContext. Used to create a hash
             data : the data that is being 'sent'
+            use_crt : boolean whether the Chinese Remainder Theorem is used to raise to the power 'd'
+            digest : the name of the digest the data is hashed with, one of digests. default_digest if None
 
         @return:
             hashed : the hash value of the message digest
             signature : the generated signature
     """
     message_digest = str.encode(data)
-    hashed = int.from_bytes(sha512(message_digest).digest(), byteorder='big')
-    signature = pow(hashed, key_pair.d, key_pair.n)
+    hasher = new_hasher(digest)
+    hasher.update(message_digest)
+    hashed = int.from_bytes(hasher.digest(), byteorder='big')
+    context = key_context(key_pair)
+    if use_crt:
+        signature = crt_signing(hashed, context)
+    else:
+        signature = arithmetic.powmod(hashed, context.d, context.n)
 
     return hashed, signature
 
 
-def verify(signature, key_pair, new_data):
+# Cache of verifications that callers can put in front of verify() and verify_batch()
+verification_cache = VerificationCache(max_size=int(os.environ.get('SIGNATURES_VERIFY_CACHE_SIZE', '4096')),
+                                       ttl=float(os.environ.get('SIGNATURES_VERIFY_CACHE_TTL', '600')))
+
+
+@metrics.instrument('verify', lambda signature, key_pair, *args, **kwargs: key_pair.n.bit_length())
+def verify(signature, key_pair, new_data, cache=None, digest=None):
     """
         Method generates original hash and hash from signature
             - Decrypted by raising signature to the power 'e' modulo 'n'
 
         @param:
             signature : the signature from the data that was sent through
-            key_pair : the key pair that was generated earlier
+            key_pair : the key pair that was generated earlier, or its KeyContext
             new_data : this represents the data that is being checked against the first signature
+            cache : a VerificationCache, such as verification_cache, to skip decrypting signatures that were
+                    already checked. None to not use one
+            digest : the name of the digest the data was signed with, one of digests. default_digest if None
 
         @return:
             hashed : the hash of the new data
             hash_from_signature : decrypting of the signature into the hash
     """
     valid_signature = str.encode(new_data)
-    hashed = int.from_bytes(sha512(valid_signature).digest(), byteorder='big')
-    hash_from_signature = pow(signature, key_pair.e, key_pair.n)
+    hasher = new_hasher(digest)
+    hasher.update(valid_signature)
+    data_digest = hasher.digest()
+    hashed = int.from_bytes(data_digest, byteorder='big')
+    context = key_context(key_pair)
+    if cache is None:
+        return hashed, arithmetic.powmod(signature, context.e, context.n)
+
+    # Keyed by the whole public key, public keys come from clients and a short fingerprint of one can be collided
+    key = (context.n, context.e, data_digest, signature)
+    hash_from_signature = cache.get(key)
+    if hash_from_signature is None:
+        hash_from_signature = arithmetic.powmod(signature, context.e, context.n)
+        cache.put(key, hash_from_signature)
     return hashed, hash_from_signature
 
 
+# Size of the buffers that streams and files are hashed in, so memory use does not grow with the data
+chunk_size = 1 << 20
+# Extension of the detached signature file that is written next to a signed file
+signature_extension = '.sig'
+
+
+def hash_stream(stream, digest=None):
+    """
+        Method hashes data a chunk at a time instead of all at once
+
+        @param:
+            stream : a binary file-like object, or an iterable of bytes chunks
+            digest : the name of the digest, one of digests. default_digest if None
+
+        @return:
+            hashed : the hash value of the data
+    """
+    hasher = new_hasher(digest)
+    if hasattr(stream, 'readinto'):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        size = stream.readinto(buffer)
+        while size:
+            hasher.update(view[:size])
+            size = stream.readinto(buffer)
+    elif hasattr(stream, 'read'):
+        chunk = stream.read(chunk_size)
+        while chunk:
+            hasher.update(chunk)
+            chunk = stream.read(chunk_size)
+    else:
+        for chunk in stream:
+            hasher.update(chunk)
+    return int.from_bytes(hasher.digest(), byteorder='big')
+
+
+def hash_file(path, digest=None):
+    """
+        Method hashes a file by memory mapping it and feeding it to the digest a chunk at a time
+
+        @param:
+            path : the path of the file
+            digest : the name of the digest, one of digests. default_digest if None
+
+        @return:
+            hashed : the hash value of the file
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return hash_stream(file, digest)
+        hasher = new_hasher(digest)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                for offset in range(0, len(view), chunk_size):
+                    hasher.update(view[offset:offset + chunk_size])
+    return int.from_bytes(hasher.digest(), byteorder='big')
+
+
+def sign_stream(key_pair, stream, use_crt=True, digest=None):
+    """
+        Method signs data that is read a chunk at a time, same as signing but for data too big to hold in memory
+
+        @param:
+            key_pair : the key pair that was generated earlier, or its KeyContext
+            stream : a binary file-like object, or an iterable of bytes chunks
+            use_crt : boolean whether the Chinese Remainder Theorem is used to raise to the power 'd'
+            digest : the name of the digest, one of digests. default_digest if None
+
+        @return:
+            hashed : the hash value of the data
+            signature : the generated signature
+    """
+    hashed = hash_stream(stream, digest)
+    context = key_context(key_pair)
+    if use_crt:
+        signature = crt_signing(hashed, context)
+    else:
+        signature = arithmetic.powmod(hashed, context.d, context.n)
+    return hashed, signature
+
+
+def write_signature_file(signature_path, key_pair, signature, digest=None):
+    """
+        Method writes a detached signature file. Each line is 'name: value' with the numbers in hex:
+            - digest : the hash algorithm that was used
+            - n, e : the public key of the signer
+            - signature : the signature
+
+        @param:
+            signature_path : the path the signature file is written to
+            key_pair : the key pair the signature was made with
+            signature : the signature
+            digest : the name of the digest the data was hashed with. default_digest if None
+    """
+    with open(signature_path, 'w') as file:
+        file.write("digest: " + check_digest(digest) + "\n")
+        file.write("n: " + format(key_pair.n, 'x') + "\n")
+        file.write("e: " + format(key_pair.e, 'x') + "\n")
+        file.write("signature: " + format(signature, 'x') + "\n")
+
+
+def read_signature_file(signature_path):
+    """
+        Method reads a detached signature file written by write_signature_file
+
+        @param:
+            signature_path : the path of the signature file
+
+        @return:
+            fields : dictionary of the digest name and the integer values of 'n', 'e' and 'signature'
+    """
+    fields = {}
+    with open(signature_path) as file:
+        for line in file:
+            name, separator, value = line.partition(':')
+            if separator:
+                fields[name.strip()] = value.strip()
+    try:
+        return {'digest': fields['digest'], 'n': int(fields['n'], 16), 'e': int(fields['e'], 16),
+                'signature': int(fields['signature'], 16)}
+    except KeyError as missing:
+        raise ValueError("[Error] Signature file is missing " + str(missing) + ".")
+
+
+def sign_file(key_pair, path, signature_path=None, use_crt=True, digest=None):
+    """
+        Method signs a file without reading it all into memory and writes the detached signature next to it
+
+        @param:
+            key_pair : the key pair that was generated earlier, or its KeyContext
+            path : the path of the file being signed
+            signature_path : where the signature is written. Defaults to the path of the file with '.sig' added
+            use_crt : boolean whether the Chinese Remainder Theorem is used to raise to the power 'd'
+            digest : the name of the digest, one of digests. default_digest if None. It is stored in the signature file
+
+        @return:
+            signature : the generated signature
+    """
+    digest = check_digest(digest)
+    hashed = hash_file(path, digest)
+    context = key_context(key_pair)
+    if use_crt:
+        signature = crt_signing(hashed, context)
+    else:
+        signature = arithmetic.powmod(hashed, context.d, context.n)
+    write_signature_file(signature_path or path + signature_extension, key_pair, signature, digest)
+    return signature
+
+
+def verify_file(path, key_pair, signature_path=None):
+    """
+        Method verifies a file against its detached signature without reading it all into memory
+            - The file is hashed with the digest stored in the signature file
+            - The public key stored in the signature file is never trusted, anyone can re-sign a file with a key of
+              their own. A signature file made with another key than the trusted one is not valid
+
+        @param:
+            path : the path of the file being checked
+            key_pair : the key pair, or public key, of the signer that is trusted
+            signature_path : where the signature is read from. Defaults to the path of the file with '.sig' added
+
+        @return:
+            Boolean :  True if the signature is valid for the file, False otherwise
+    """
+    if key_pair is None:
+        raise ValueError("[Error] A trusted public key is needed to verify a file.")
+    fields = read_signature_file(signature_path or path + signature_extension)
+    digest = check_digest(fields['digest'])
+    e, n = key_pair.e, key_pair.n
+    if (fields['e'], fields['n']) != (e, n):
+        return False
+    hash_from_signature = arithmetic.powmod(fields['signature'], e, n)
+    return verifier(hash_file(path, digest), hash_from_signature)
+
+
+def verify_batch(pairs, key_pair, cache=None, digest=None):
+    """
+        Method verifies many signatures made with the same key pair in one loop
+            - one hash object is created and copied for every message instead of set up again
+            - data that is already bytes is hashed as is instead of being encoded
+
+        @param:
+            pairs : iterable of (data, signature) where data is a str or bytes and signature is an int
+            key_pair : the key pair, just the public key, or the KeyContext of either that the signatures were made with
+            cache : a VerificationCache, such as verification_cache, to skip decrypting signatures that were
+                    already checked. None to not use one
+            digest : the name of the digest the data was signed with, one of digests. default_digest if None
+
+        @return:
+            results : list of booleans, True for every signature that is valid
+            failing : the indices of the signatures that are not valid
+    """
+    context = key_context(key_pair)
+    e, n = context.e, context.n
+    powmod = arithmetic.powmod
+    base_hasher = new_hasher(digest)
+    results = []
+    failing = []
+    for index, (data, signature) in enumerate(pairs):
+        hasher = base_hasher.copy()
+        if isinstance(data, str):
+            data = data.encode()
+        hasher.update(data)
+        data_digest = hasher.digest()
+        if cache is None:
+            hash_from_signature = powmod(signature, e, n)
+        else:
+            hash_from_signature = cache.get((n, e, data_digest, signature))
+            if hash_from_signature is None:
+                hash_from_signature = powmod(signature, e, n)
+                cache.put((n, e, data_digest, signature), hash_from_signature)
+        is_valid = hash_from_signature == int.from_bytes(data_digest, byteorder='big')
+        results.append(is_valid)
+        if not is_valid:
+            failing.append(index)
+    return results, failing
+
+
+# Batches of at least this many messages are signed on worker processes when batch_workers is more than 1
+batch_parallel_threshold = 1000
+# Number of messages that are sent to a worker process at a time
+batch_chunk_size = 256
+batch_workers = int(os.environ.get('SIGNATURES_BATCH_WORKERS', os.cpu_count() or 1))
+# One process pool per number of workers, kept for the life of the process. A pool is never replaced or shut down
+# while the process runs, since another thread may still be signing a batch on it
+batch_executors = {}
+batch_executor_lock = Lock()
+
+
+def sign_chunk(key_pair, messages, digest=None):
+    """
+        Helper method: iter_sign_batch(key_pair, messages, workers, digest)
+            - signs messages in one loop, on a worker process for large batches
+
+        @param:
+            key_pair : the KeyContext of the key pair
+            messages : list of str or bytes
+            digest : the name of the digest, one of digests
+
+        @return:
+            signatures : the signature of every message
+    """
+    context = key_context(key_pair)
+    base_hasher = new_hasher(digest)
+    signatures = []
+    for data in messages:
+        hasher = base_hasher.copy()
+        if isinstance(data, str):
+            data = data.encode()
+        hasher.update(data)
+        signatures.append(crt_signing(int.from_bytes(hasher.digest(), byteorder='big'), context))
+    return signatures
+
+
+def iter_sign_batch(key_pair, messages, workers=None, digest=None):
+    """
+        Method signs many messages with one key pair, giving back each signature as soon as it is made
+            - Batches of batch_parallel_threshold messages and up are split in chunks and signed on worker processes
+
+        @param:
+            key_pair : the key pair the messages are signed with, or its KeyContext
+            messages : list of str or bytes
+            workers : the number of worker processes to use for large batches. Defaults to batch_workers
+            digest : the name of the digest, one of digests. default_digest if None
+
+        @return:
+            signatures : generator of the signature of every message, in order
+    """
+    # Only the KeyContext is sent to the workers since a PyCryptodome key is not cheap to send
+    key_pair = key_context(key_pair)
+    # Checked here so an unsupported digest fails before anything is signed, and the workers get the same default
+    digest = check_digest(digest)
+    if workers is None:
+        workers = batch_workers
+    if workers <= 1 or len(messages) < batch_parallel_threshold:
+        for index in range(0, len(messages), batch_chunk_size):
+            yield from sign_chunk(key_pair, messages[index:index + batch_chunk_size], digest)
+        return
+
+    with batch_executor_lock:
+        executor = batch_executors.get(workers)
+        if executor is None:
+            executor = batch_executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    chunks = [messages[index:index + batch_chunk_size] for index in range(0, len(messages), batch_chunk_size)]
+    for signatures in executor.map(sign_chunk, [key_pair] * len(chunks), chunks, [digest] * len(chunks)):
+        yield from signatures
+
+
+def sign_batch(key_pair, messages, workers=None, digest=None):
+    """
+        Method signs many messages with one key pair so the cost of getting a key is only paid once
+
+        @param:
+            key_pair : the key pair the messages are signed with, or its KeyContext
+            messages : list of str or bytes
+            workers : the number of worker processes to use for large batches. Defaults to batch_workers
+            digest : the name of the digest, one of digests. default_digest if None
+
+        @return:
+            signatures : list of the signature of every message
+    """
+    return list(iter_sign_batch(key_pair, messages, workers, digest))
+
+
+@metrics.instrument('verifier')
 def verifier(hashed, hash_from_signature):
     """
         Method verifies whether the original value is equivalent to the new one
@@ -71,29 +738,61 @@ def verifier(hashed, hash_from_signature):
     return hashed == hash_from_signature
 
 
-def demonstration(data, new_data, bit_size):
+def demonstration_key(bit_size, use_pool=False, use_keystore=False, primes=2):
+    """
+        Method gets the key pair of a demonstration
+
+        @param:
+            bit_size : the size of the key pair
+            use_pool : boolean whether the key pair is taken from the key pool instead of generated inline
+            use_keystore : boolean whether a saved key pair of the bit size is reused, saving one if there is none.
+                           Only for 2 primes, multi-prime key pairs are not saved
+            primes : the number of primes in the modulus
+
+        @return:
+            key_pair : this contains a public and private key
+    """
+    if use_keystore and primes == 2:
+        return keystore.get_or_generate(bit_size, generate)
+    if use_pool:
+        return pool_for(primes).acquire(bit_size)
+    return generate(bit_size, primes)
+
+
+def demonstration(data, new_data, bit_size, use_pool=False, use_keystore=False, primes=2, output_format=None,
+                  digest=None, key_pair=None):
     """
         Method gets the key pair, hash of sent and received data and returns whether the signature is valid.
 
         @param:
             data : the sent data
             new_data : the received data
+            bit_size : the size of the key pair
+            use_pool : boolean whether the key pair is taken from the key pool instead of generated inline
+            use_keystore : boolean whether a saved key pair of the bit size is reused, saving one if there is none.
+                           Only for 2 primes, multi-prime key pairs are not saved
+            primes : the number of primes in the modulus
+            output_format : the format the keys are written in, one of serialization.formats.
+                            serialization.default_format if None
+            digest : the name of the digest the data is hashed with, one of digests. default_digest if None
+            key_pair : the key pair to use, None to get one with demonstration_key()
 
         @return:
-            public_key : the public key in form (n,e)
-            private_key : the private key in form (n,d)
+            public_key : the public key in form (n,e), or DER
+            private_key : the private key in form (n,d), or DER
             original_hash : the hash of the sent message
             hashed : the hash of the received message
             is_valid : boolean whether the signature was valid or not
             signature : the signature that was generated
     """
-    key_pair = generate(bit_size)
-    original_hash, signature = signing(key_pair, data)
-    hashed, new_signature = verify(signature, key_pair, new_data)
+    if key_pair is None:
+        key_pair = demonstration_key(bit_size, use_pool, use_keystore, primes)
+    original_hash, signature = signing(key_pair, data, digest=digest)
+    hashed, new_signature = verify(signature, key_pair, new_data, digest=digest)
     is_valid = verifier(hashed, new_signature)
 
-    public_key = "(" + str(key_pair.n) + ", " + str(key_pair.e) + ")"
-    private_key = "(" + str(key_pair.n) + ", " + str(key_pair.d) + ")"
+    public_key = serialization.encode_key(key_pair, output_format)
+    private_key = serialization.encode_key(key_pair, output_format, private=True)
     if is_valid:
         is_valid = "Valid"
     else:
@@ -101,7 +800,7 @@ def demonstration(data, new_data, bit_size):
     return public_key, private_key, original_hash, hashed, is_valid, signature
 
 
-def time_difference(first_bit_size, second_bit_size, data, new_data):
+def time_difference(first_bit_size, second_bit_size, data, new_data, progress=None, primes=2):
     """
         Method gets the time difference between encrypting and decrypting the same data using different bit sizes
             - Called for the Time difference page
@@ -111,20 +810,28 @@ def time_difference(first_bit_size, second_bit_size, data, new_data):
             second_bit_size : The second bit size
             data : The original data sent
             new_data : The received data
+            progress : method called as progress(fraction, message) once each run is done, None to not report it
+            primes : the number of primes in the modulus
 
         @return:
             difference : the time difference between the first and second run through of presumably different bit sizes
             is_valid : boolean whether the signature is valid or not
             first_run_time : the time it took for the first bit size to run
             second_run_time : the time it took for the second bit size to run
+            first_key_pair : the key pair of the first bit size, so it can be timed again without generating another
+            second_key_pair : the key pair of the second bit size
     """
-    first_run_time, is_valid = time_difference_helper(first_bit_size, data, new_data)
-    second_run_time, is_valid = time_difference_helper(second_bit_size, data, new_data)
+    first_run_time, is_valid, first_key_pair = time_difference_helper(first_bit_size, data, new_data, primes)
+    if progress is not None:
+        progress(0.5, "Finished " + str(first_bit_size) + " bits")
+    second_run_time, is_valid, second_key_pair = time_difference_helper(second_bit_size, data, new_data, primes)
+    if progress is not None:
+        progress(1.0, "Finished " + str(second_bit_size) + " bits")
     difference_in_time = abs(second_run_time - first_run_time)
-    return difference_in_time, is_valid, first_run_time, second_run_time
+    return difference_in_time, is_valid, first_run_time, second_run_time, first_key_pair, second_key_pair
 
 
-def time_difference_helper(bit_size, data, new_data):
+def time_difference_helper(bit_size, data, new_data, primes=2):
     """
         Helper method: time_difference(first_bit_size, second_bit_size, data, new_data)
             - gets the time difference between encrypting and decrypting the same data using different bit sizes
@@ -133,16 +840,47 @@ def time_difference_helper(bit_size, data, new_data):
             bit_size : the bit size that is currently being used
             data : The original data sent
             new_data : The received data
+            primes : the number of primes in the modulus
 
         @return:
-            difference : the time difference between the first and second run through of presumably different bit sizes
+            run_time : the time it took to generate the key pair, sign and verify
             is_valid : boolean whether the signature is valid or not
+            key_pair : the key pair that was generated
     """
-    start = time.time()
-    public_key, private_key, original_hash, hashed, is_valid, signature = demonstration(data, new_data, bit_size)
-    end = time.time()
+    start = time.perf_counter()
+    key_pair = demonstration_key(bit_size, primes=primes)
+    public_key, private_key, original_hash, hashed, is_valid, signature = demonstration(data, new_data, bit_size,
+                                                                                        primes=primes,
+                                                                                        key_pair=key_pair)
+    end = time.perf_counter()
     run_time = (end - start)
-    return run_time, is_valid
+    return run_time, is_valid, key_pair
+
+
+def crt_comparison(key_pair, data):
+    """
+        Method times signing the same data with and without the Chinese Remainder Theorem using one key pair
+            - Called for the Time difference page to show both side by side, with the key pairs time_difference
+              already generated so that no more are generated or taken from the key pool
+
+        @param:
+            key_pair : the key pair that was generated earlier
+            data : The original data sent
+
+        @return:
+            crt_time : the time it took to sign using the Chinese Remainder Theorem
+            plain_time : the time it took to sign using the full private exponent
+    """
+    key_pair = key_context(key_pair)
+
+    start = time.perf_counter()
+    signing(key_pair, data, use_crt=True)
+    crt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    signing(key_pair, data, use_crt=False)
+    plain_time = time.perf_counter() - start
+    return crt_time, plain_time
 
 
 def bit_size_checking(some_bit_size):
@@ -153,13 +891,13 @@ def bit_size_checking(some_bit_size):
             some_bit_size : what the user enters as a bit size
 
         @return:
-            True or False :  True if the value is an integer that is a multiple of 1024. False otherwise
+            True or False :  True if the value is an integer that is a positive multiple of 1024. False otherwise
     """
     try:
         value = int(some_bit_size)
-        if value % 1024 == 0:
+        if value >= 1024 and value % 1024 == 0:
             return True
         else:
             return False
-    except ValueError or TypeError:
+    except (ValueError, TypeError):
         return False
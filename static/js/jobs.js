@@ -0,0 +1,40 @@
+function pollJob(jobId, onProgress, onDone) {
+	$.getJSON('/jobs/' + jobId)
+	.done(function(job) {
+		if (job.status === 'finished') {
+			onDone(job.result);
+		} else if (job.status === 'failed') {
+			onDone({error : '[Error] ' + job.error});
+		} else {
+			onProgress(job);
+			setTimeout(function() {
+				pollJob(jobId, onProgress, onDone);
+			}, 500);
+		}
+	})
+	.fail(function() {
+		onDone({error : '[Error] Lost track of the request.'});
+	});
+}
+
+function submitJob(url, data, onProgress, onDone) {
+	data.async = true;
+	$.ajax({
+		data : data,
+		type : 'POST',
+		url : url
+	})
+	.always(function(response, textStatus, xhr) {
+		if (response.responseJSON) {
+			response = response.responseJSON;
+		}
+		if (response.job_id) {
+			pollJob(response.job_id, onProgress, onDone);
+		} else if (textStatus === 'success') {
+			// The server ran the request inline instead of as a background job
+			onDone(response);
+		} else {
+			onDone(response.error ? response : {error : '[Error] The request failed.'});
+		}
+	});
+}
@@ -1,15 +1,19 @@
 $(document).ready(function() {
 	$('form').on('submit', function(event) {
-		$.ajax({
-			data : {
-				new_input : $('#new_input').val(),
-				original_input : $('#original_input').val(),
-				first_bit_size : $('#first_bit').val()
-			},
-			type : 'POST',
-			url : '/process'
-		})
-		.done(function(data) {
+		submitJob('/process', {
+			new_input : $('#new_input').val(),
+			original_input : $('#original_input').val(),
+			first_bit_size : $('#first_bit').val(),
+			reuse_key : $('#reuse_key').is(':checked'),
+			primes : $('#primes').val(),
+			format : $('#format').val(),
+			digest : $('#digest').val()
+		},
+		function(job) {
+			$('#progressAlert').text('[Working] ' + job.message).show();
+		},
+		function(data) {
+			$('#progressAlert').hide();
 			if (data.error) {
 				$('#errorAlert').text(data.error).show();
 				$('#successAlert').hide();
@@ -29,4 +33,4 @@ $(document).ready(function() {
 		});
 		event.preventDefault();
 	});
-});
\ No newline at end of file
+});
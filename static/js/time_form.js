@@ -1,28 +1,33 @@
 $(document).ready(function() {
 	$('form').on('submit', function(event) {
-		$.ajax({
-			data : {
-				new_input : $('#new_input').val(),
-				original_input : $('#original_input').val(),
-				first_bit_size : $('#first_bit').val(),
-				second_bit_size : $('#second_bit').val()
-			},
-			type : 'POST',
-			url : '/time_process'
-		})
-		.done(function(data) {
+		submitJob('/time_process', {
+			new_input : $('#new_input').val(),
+			original_input : $('#original_input').val(),
+			first_bit_size : $('#first_bit').val(),
+			second_bit_size : $('#second_bit').val(),
+			primes : $('#primes').val()
+		},
+		function(job) {
+			$('#progressAlert').text('[Working] ' + Math.round(job.progress * 100) + '% ' + job.message).show();
+		},
+		function(data) {
+			$('#progressAlert').hide();
 			if (data.error) {
 				$('#errorAlert').text(data.error).show();
 				$('#successAlert').hide();
 				$('#difference').hide();
+				$('#first_crt').hide();
+				$('#second_crt').hide();
 			} else {
 				$('#successAlert').text(data.name).show();
 				$('#first_bit_size').text(data.first_bit_size).show();
 				$('#second_bit_size').text(data.second_bit_size).show();
 				$('#difference').text(data.difference).show();
+				$('#first_crt').text(data.first_crt).show();
+				$('#second_crt').text(data.second_crt).show();
 				$('#errorAlert').hide();
 			}
 		});
 		event.preventDefault();
 	});
-});
\ No newline at end of file
+});
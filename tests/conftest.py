@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules are run as scripts from the root of the project and from Demonstration, so both are put on the path
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in (root, os.path.join(root, 'Demonstration')):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
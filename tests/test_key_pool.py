@@ -0,0 +1,96 @@
+import itertools
+import time
+
+import pytest
+
+from key_pool import KeyPool
+
+
+def make_generator(fail_on=()):
+    """
+        Method makes a generator that hands out numbered stand-ins for key pairs, so no RSA key has to be generated
+
+        @param:
+            fail_on : bit sizes that raise instead
+
+        @return:
+            generator : method of a bit size to (bit_size, number)
+    """
+    numbers = itertools.count()
+
+    def generator(bit_size):
+        if bit_size in fail_on:
+            raise ValueError("[Error] Could not generate " + str(bit_size) + " bits.")
+        return bit_size, next(numbers)
+    return generator
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_warm_then_get_is_a_hit():
+    pool = KeyPool(make_generator(), low_watermark=1, high_watermark=3)
+    pool.warm(1024)
+    assert pool.stats()['sizes'][1024]['ready'] == 3
+    key_pair = pool.get(1024)
+    assert key_pair[0] == 1024
+    assert pool.stats()['hits'] == 1
+    assert pool.stats()['misses'] == 0
+
+
+def test_empty_pool_misses_and_is_refilled_to_the_high_watermark():
+    pool = KeyPool(make_generator(), low_watermark=1, high_watermark=2)
+    assert pool.get(2048) is None
+    assert pool.stats()['misses'] == 1
+    assert wait_for(lambda: pool.stats()['sizes'][2048]['ready'] == 2)
+    assert pool.stats()['refills'] == 2
+    assert pool.get(2048)[0] == 2048
+
+
+def test_acquire_generates_inline_when_empty():
+    pool = KeyPool(make_generator(), low_watermark=0, high_watermark=0)
+    assert pool.acquire(1024)[0] == 1024
+    assert pool.stats()['misses'] == 1
+
+
+def test_least_requested_bit_size_is_evicted():
+    pool = KeyPool(make_generator(), low_watermark=0, high_watermark=0, max_sizes=2)
+    for bit_size in (1024, 1024, 2048):
+        pool.get(bit_size)
+    pool.get(3072)
+    sizes = pool.stats()['sizes']
+    assert set(sizes) == {1024, 3072}
+    assert pool.stats()['evictions'] == 1
+
+
+def test_bit_sizes_above_the_maximum_are_never_pooled():
+    pool = KeyPool(make_generator(), max_bit_size=4096)
+    assert pool.get(8192) is None
+    assert pool.acquire(16384)[0] == 16384
+    stats = pool.stats()
+    assert stats['bypasses'] == 2
+    assert stats['sizes'] == {}
+    with pytest.raises(ValueError):
+        pool.warm(8192)
+
+
+def test_bit_sizes_below_the_minimum_are_refused():
+    pool = KeyPool(make_generator())
+    with pytest.raises(ValueError):
+        pool.get(512)
+    assert pool.stats()['sizes'] == {}
+
+
+def test_failed_refill_only_drops_its_bit_size():
+    pool = KeyPool(make_generator(fail_on=(3072,)), low_watermark=1, high_watermark=1)
+    pool.get(3072)
+    pool.get(1024)
+    assert wait_for(lambda: pool.stats()['refill_failures'] == 1)
+    assert wait_for(lambda: pool.stats()['sizes'].get(1024, {}).get('ready') == 1)
+    assert 3072 not in pool.stats()['sizes']
@@ -0,0 +1,61 @@
+import math
+import random
+
+import pytest
+
+from digital_signatures import LatencyHistogram
+
+
+def exact_percentile(times, fraction):
+    ordered = sorted(times)
+    return ordered[max(1, math.ceil(fraction * len(ordered))) - 1]
+
+
+@pytest.fixture(scope='module')
+def times():
+    generator = random.Random(1)
+    return [generator.lognormvariate(math.log(0.01), 1.0) for n in range(20000)]
+
+
+@pytest.mark.parametrize('fraction', [0.01, 0.25, 0.5, 0.9, 0.99, 0.999])
+def test_percentiles_are_close_to_the_exact_ones(times, fraction):
+    histogram = LatencyHistogram()
+    for seconds in times:
+        histogram.record(seconds)
+    expected = exact_percentile(times, fraction)
+    # Every bucket is narrower than 1 / 2 ** (significant_bits - 1) of the times in it
+    assert histogram.percentile(fraction) == pytest.approx(expected, rel=1 / 64)
+
+
+def test_count_mean_and_extremes_are_exact(times):
+    histogram = LatencyHistogram()
+    for seconds in times:
+        histogram.record(seconds)
+    assert histogram.count == len(times)
+    assert histogram.mean() == pytest.approx(sum(times) / len(times))
+    assert histogram.percentile(0.0) >= min(times)
+    assert histogram.percentile(1.0) == max(times)
+    assert (histogram.fastest, histogram.slowest) == (min(times), max(times))
+
+
+def test_merged_histograms_match_one_histogram(times):
+    whole = LatencyHistogram()
+    parts = [LatencyHistogram() for n in range(4)]
+    for index, seconds in enumerate(times):
+        whole.record(seconds)
+        parts[index % 4].record(seconds)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.counts == whole.counts
+    for fraction in (0.5, 0.99):
+        assert merged.percentile(fraction) == whole.percentile(fraction)
+
+
+def test_histograms_with_other_buckets_are_not_merged():
+    with pytest.raises(ValueError):
+        LatencyHistogram().merge(LatencyHistogram(significant_bits=5))
+
+
+def test_empty_histogram():
+    assert LatencyHistogram().percentile(0.5) == 0.0
@@ -0,0 +1,43 @@
+from math import gcd
+
+import primes
+
+
+def test_generate_key_makes_a_working_key_pair():
+    key_pair = primes.generate_key(1024)
+    assert key_pair.n.bit_length() == 1024
+    assert key_pair.p * key_pair.q == key_pair.n
+    assert primes.is_valid_pair(key_pair.p, key_pair.q, 1024)
+    assert gcd(key_pair.e, (key_pair.p - 1) * (key_pair.q - 1)) == 1
+    message = 0x1234567890abcdef
+    assert pow(pow(message, key_pair.d, key_pair.n), key_pair.e, key_pair.n) == message
+
+
+def test_generated_primes_have_the_right_size():
+    for bits in (256, 512, 513):
+        prime = primes.generate_prime(bits)
+        assert prime.bit_length() == bits
+        assert primes.is_probable_prime(prime, primes.rounds_for(bits))
+        assert (prime - 1) % 65537 != 0
+
+
+def test_primes_that_are_too_close_are_not_valid():
+    p = primes.generate_prime(512)
+    q = p + 2
+    while not primes.is_probable_prime(q, 40):
+        q += 2
+    assert not primes.is_valid_pair(p, q, (p * q).bit_length())
+
+
+def test_primes_that_make_the_wrong_size_are_not_valid():
+    # A 512 and a 511 bit prime make a modulus of 1022 or 1023 bits
+    p = primes.generate_prime(512)
+    q = primes.generate_prime(511)
+    assert not primes.is_valid_pair(p, q, 1024)
+
+
+def test_is_probable_prime_on_known_numbers():
+    assert primes.is_probable_prime(2 ** 127 - 1, 40)
+    assert not primes.is_probable_prime(2 ** 128 + 1, 40)
+    # Carmichael number, which fools the Fermat test
+    assert not primes.is_probable_prime(561, 40)
@@ -0,0 +1,49 @@
+import pytest
+from Cryptodome.PublicKey import RSA
+
+import serialization
+
+
+@pytest.mark.parametrize('output_format', serialization.formats)
+@pytest.mark.parametrize('value', [0, 1, 255, 256, 2 ** 64 - 1, 3 ** 1000])
+def test_integers_round_trip(output_format, value):
+    text = serialization.encode_int(value, output_format)
+    assert serialization.decode_int(text, output_format) == value
+
+
+def test_decimal_above_the_int_max_str_digits_limit():
+    value = 10 ** 5000 + 12345
+    text = serialization.to_decimal(value)
+    assert text == '1' + '0' * 4995 + '12345'
+    assert serialization.from_decimal(text) == value
+
+
+def test_decimal_round_trip_of_a_large_modulus():
+    value = 7 ** 20000 - 1
+    text = serialization.encode_int(value, 'decimal')
+    assert len(text) > 4300
+    assert text.isdigit() and not text.startswith('0')
+    assert serialization.decode_int(text, 'decimal') == value
+
+
+def test_from_decimal_rejects_other_characters():
+    with pytest.raises(ValueError):
+        serialization.from_decimal('1' * 3000 + 'x')
+
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError):
+        serialization.encode_int(1, 'octal')
+
+
+@pytest.mark.parametrize('output_format', serialization.formats)
+def test_public_key_round_trip(output_format):
+    key_pair = RSA.generate(1024)
+    if output_format == 'der':
+        public_key = serialization.encode_key(key_pair, output_format)
+    else:
+        public_key = {'n': serialization.encode_int(key_pair.n, output_format),
+                      'e': serialization.encode_int(key_pair.e, output_format)}
+    decoded = serialization.decode_public_key(public_key, output_format)
+    assert (decoded.n, decoded.e) == (key_pair.n, key_pair.e)
+    assert not decoded.has_private()
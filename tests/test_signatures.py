@@ -0,0 +1,61 @@
+import random
+
+import pytest
+from Cryptodome.PublicKey import RSA
+
+import primes
+import signatures
+
+
+@pytest.fixture(scope='module')
+def key_pair():
+    return RSA.generate(1024)
+
+
+@pytest.mark.parametrize('prime_count', [3, 4])
+def test_multi_prime_signing_matches_pow(prime_count):
+    found = set()
+    while len(found) < prime_count:
+        found.add(primes.generate_prime(384))
+    key_pair = signatures.MultiPrimeKey(sorted(found))
+    generator = random.Random(prime_count)
+    for n in range(20):
+        hashed = generator.randrange(key_pair.n)
+        expected = pow(hashed, key_pair.d, key_pair.n)
+        assert signatures.multi_prime_signing(hashed, key_pair) == expected
+        assert signatures.crt_signing(hashed, key_pair) == expected
+
+
+def test_crt_signing_matches_pow(key_pair):
+    generator = random.Random(2)
+    for n in range(20):
+        hashed = generator.randrange(key_pair.n)
+        assert signatures.crt_signing(hashed, key_pair) == pow(hashed, key_pair.d, key_pair.n)
+
+
+def test_verify_file(key_pair, tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'some data' * 1000)
+    signatures.sign_file(key_pair, str(path))
+    assert signatures.verify_file(str(path), key_pair)
+    assert signatures.verify_file(str(path), key_pair.publickey())
+    path.write_bytes(b'other data')
+    assert not signatures.verify_file(str(path), key_pair)
+
+
+def test_verify_file_rejects_a_signature_file_of_another_key(key_pair, tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'some data')
+    # A valid signature, with the public key of its signer, but not the signer that is trusted
+    other_key = RSA.generate(1024)
+    signatures.sign_file(other_key, str(path))
+    assert signatures.verify_file(str(path), other_key)
+    assert not signatures.verify_file(str(path), key_pair)
+
+
+def test_verify_file_needs_a_trusted_key(key_pair, tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'some data')
+    signatures.sign_file(key_pair, str(path))
+    with pytest.raises(ValueError):
+        signatures.verify_file(str(path), None)
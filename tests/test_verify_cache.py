@@ -0,0 +1,68 @@
+import pytest
+from Cryptodome.PublicKey import RSA
+
+import signatures
+import verify_cache
+from verify_cache import VerificationCache
+
+
+@pytest.fixture(scope='module')
+def key_pair():
+    return RSA.generate(1024)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerificationCache(max_size=2, ttl=None)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size'] == 2
+
+
+def test_entries_expire_after_the_time_to_live(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(verify_cache.time, 'monotonic', lambda: now[0])
+    cache = VerificationCache(max_size=4, ttl=10)
+    cache.put('a', 1)
+    now[0] += 9
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['size']) == (1, 1, 1, 0)
+
+
+def test_cached_verification_matches_uncached(key_pair):
+    cache = VerificationCache(max_size=8, ttl=None)
+    hashed, signature = signatures.signing(key_pair, "message")
+    assert signatures.verify(signature, key_pair, "message", cache=cache) == (hashed, hashed)
+    assert signatures.verify(signature, key_pair, "message", cache=cache) == (hashed, hashed)
+    assert cache.stats()['hits'] == 1
+
+
+def test_cache_key_includes_the_public_exponent(key_pair):
+    cache = VerificationCache(max_size=8, ttl=None)
+    hashed, signature = signatures.signing(key_pair, "message")
+    signatures.verify(signature, key_pair, "message", cache=cache)
+    # Same modulus, another exponent: must not be given the result cached for the real key
+    other_key = RSA.construct((key_pair.n, 3))
+    other_hashed, hash_from_signature = signatures.verify(signature, other_key, "message", cache=cache)
+    assert hash_from_signature != other_hashed
+    assert cache.stats()['hits'] == 0
+
+
+def test_cache_key_includes_the_signature(key_pair):
+    cache = VerificationCache(max_size=8, ttl=None)
+    hashed, signature = signatures.signing(key_pair, "message")
+    signatures.verify(signature, key_pair, "message", cache=cache)
+    other_hashed, hash_from_signature = signatures.verify(signature + 1, key_pair, "message", cache=cache)
+    assert hash_from_signature != other_hashed
+    results, failing = signatures.verify_batch([("message", signature), ("message", signature + 1)], key_pair,
+                                               cache=cache)
+    assert (results, failing) == ([True, False], [1])
+    assert cache.stats()['hits'] == 2
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class VerificationCache:
+    """
+        Least recently used cache of verifications so that checking the same signature again skips pow().
+
+        Entries are keyed by (n, e, digest of the data, signature) and are dropped when:
+            - the cache is full and they are the least recently used
+            - they are older than the time to live
+
+        @param:
+            max_size : the most entries that are kept
+            ttl : the seconds an entry is kept for, None to keep entries until they are the least recently used
+    """
+
+    def __init__(self, max_size=4096, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+            Method gets a cached value, counting a hit or a miss
+
+            @param:
+                key : (n, e, digest, signature)
+
+            @return:
+                value : the cached value, None if it is not cached or has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+            Method caches a value, evicting the least recently used entry if the cache is full
+
+            @param:
+                key : (n, e, digest, signature)
+                value : the value to cache
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+            Method gets the counters of the cache
+
+            @return:
+                stats : dictionary of the size, hits, misses, evictions and expirations
+        """
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'expirations': self.expirations}